@@ -1,5 +1,6 @@
 import os
 import logging
+from datetime import timedelta
 from dotenv import load_dotenv
 
 # Load environment variables FIRST, before importing modules
@@ -9,6 +10,14 @@ from flask import Flask, render_template
 
 from modules.db import get_db, close_db, DB_PATH
 from modules.routes import bp
+from modules.archive import start_archiver
+from modules.backup import start_backups
+from modules.print import printer_status
+from modules.assets import init_assets
+from modules.fragments import init_fragments
+from modules.clock import start_clock
+from modules.changes import start_live_feed
+from modules.credentials import PASS_HASH, SECRET
 
 # ==================================================
 # LOGGING SETUP
@@ -25,17 +34,34 @@ logger = logging.getLogger(__name__)
 
 HOST = os.getenv("TICKETS_HOST", "127.0.0.1")
 PORT = int(os.getenv("TICKETS_PORT", "5000"))
+SESSION_DAYS = int(os.getenv("TICKETS_SESSION_DAYS", "30"))
 
 app = Flask(__name__)
-app.secret_key = os.getenv("TICKETS_SECRET", "dev-secret")
+app.secret_key = SECRET
+app.config.update(
+    PERMANENT_SESSION_LIFETIME=timedelta(days=SESSION_DAYS),
+    SESSION_COOKIE_SAMESITE="Lax",
+)
 
 logger.info(f"DB: {DB_PATH}")
+if not PASS_HASH:
+    logger.warning("TICKETS_PASS is plain text; set TICKETS_PASS_HASH (python cli.py hash-password)")
+if SECRET == "dev-secret":
+    logger.warning("TICKETS_SECRET is the default; sessions and API tokens can be forged")
 
 # ==================================================
 # APP SETUP
 # ==================================================
 app.teardown_appcontext(close_db)
 app.register_blueprint(bp)
+init_assets(app)
+init_fragments(app)
+
+
+@app.context_processor
+def inject_printer_status():
+    """Expose cached printer states to every template (header badges)"""
+    return {"printer_status": printer_status()}
 
 
 # ==================================================
@@ -74,6 +100,10 @@ def handle_exception(error):
 
 # ==================================================
 if __name__ == "__main__":
+    start_clock()
+    start_live_feed()
+    start_archiver()
+    start_backups()
     app.run(
         host=HOST,
         port=PORT,
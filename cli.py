@@ -0,0 +1,370 @@
+"""
+tear-off command line interface
+
+Shares the storage layer in modules/db.py with the web app and never
+imports Flask; the printer stack is only loaded for print commands.
+Safe to run while the app is serving (WAL + busy timeout).
+
+    python cli.py add "Submit timesheet" --priority 1 --due 2026-02-06 --tags work
+    python cli.py list --week
+    python cli.py done 3f2a 9c1b
+    python cli.py print --week
+    python cli.py bulk < tickets.txt
+    python cli.py archive --days 30
+    python cli.py backup
+    python cli.py restore backups/tickets-20260206-0300.db restored.db
+    python cli.py vendor
+    python cli.py hash-password
+    python cli.py token --scopes read,sync --days 365
+    python cli.py dead-letters --retry
+"""
+import os
+import sys
+import time
+import getpass
+import argparse
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Load environment variables FIRST, before importing modules
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+from modules.archive import ARCHIVE_DAYS, archive_closed
+from modules.backup import BackupError, backup_now, list_snapshots, restore
+from modules.credentials import SCOPES, TOKEN_DAYS, hash_password, issue_token
+from modules.db import connect, normalize_tags, insert_ticket, close_ticket
+from modules.clock import bounds
+from modules.recurrence import RULES, dated_tasks, get_occurrence, materialize
+
+DEFAULT_TAGS = os.getenv("TICKETS_DEFAULT_TAGS", "work,personal")
+SHORT_ID = 8
+# How long print commands wait for an offline printer before giving up
+DRAIN_SECS = float(os.getenv("TICKETS_DRAIN_SECS", "60"))
+
+
+# ==================================================
+# HELPERS
+# ==================================================
+
+def _resolve(db, ref):
+    """Resolve a full ID, unique ID prefix or occurrence ID to a ticket ID"""
+    if get_occurrence(db, ref):
+        return ref
+    rows = db.execute(
+        "SELECT id FROM tickets WHERE id = ? OR id LIKE ? || '%' LIMIT 2",
+        (ref, ref)
+    ).fetchall()
+    if len(rows) != 1:
+        return None
+    return rows[0]["id"]
+
+
+def _show(t):
+    due = (t["due_at"] or "-").replace("T", " ")[:16]
+    tags = f" [{t['tags']}]" if t["tags"] else ""
+    print(f"{str(t['id'])[:SHORT_ID]}  P{t['priority']}  {due:<16}  {t['title']}{tags}")
+
+
+def _drain():
+    """Wait for queued print jobs; dead-letter whatever is still held
+
+    Returns False when some jobs could not be printed in time.
+    """
+    from modules.print import drain
+
+    stuck = drain(DRAIN_SECS)
+    for w in stuck:
+        held = w.shelve()
+        print(f"printer {w.name} is {w.state}: {held} jobs not printed "
+              "(python cli.py dead-letters --retry)", file=sys.stderr)
+    return not stuck
+
+
+def _add(db, title, priority=2, due=None, tags=None, notes=None, recurrence="none"):
+    if not 1 <= priority <= 5:
+        raise ValueError("priority must be between 1 and 5")
+    if due:
+        try:
+            datetime.fromisoformat(due)
+        except ValueError:
+            raise ValueError(f"invalid due date '{due}'") from None
+    if recurrence != "none" and recurrence not in RULES:
+        raise ValueError(f"unknown recurrence '{recurrence}'")
+    return insert_ticket(
+        db, title, priority, None if recurrence != "none" else due,
+        normalize_tags(tags or DEFAULT_TAGS), notes, recurrence
+    )
+
+
+# ==================================================
+# COMMANDS
+# ==================================================
+
+def cmd_add(db, args):
+    try:
+        ticket_id = _add(db, args.title, args.priority, args.due, args.tags, args.notes, args.recurrence)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    db.commit()
+    print(ticket_id)
+
+
+def cmd_list(db, args):
+    if args.week:
+        b = bounds()
+        rows = dated_tasks(db, b.iso["week_start"], b.iso["week_end"], args.tag)
+    else:
+        rows = db.execute(
+            """
+            SELECT * FROM tickets
+            WHERE status='open'
+            ORDER BY priority DESC, due_at
+            """
+        ).fetchall()
+        if args.tag:
+            rows = [t for t in rows if args.tag in (t["tags"] or "").split(",")]
+
+    if not rows:
+        print("No open tickets.")
+    for t in rows:
+        _show(t)
+
+
+def cmd_done(db, args):
+    failed = 0
+    for ref in args.ids:
+        ticket_id = _resolve(db, ref)
+        if ticket_id:
+            ticket_id = materialize(db, ticket_id) or ticket_id
+        if ticket_id and close_ticket(db, ticket_id):
+            print(f"closed {ticket_id}")
+        else:
+            print(f"no open ticket matches '{ref}'", file=sys.stderr)
+            failed += 1
+    db.commit()
+    return 1 if failed else 0
+
+
+def cmd_print(db, args):
+    # Only print commands pay for escpos / printer setup
+    from modules.print import PRINT_QR, WEEK_LAYOUT, print_ticket, print_week
+
+    qr = PRINT_QR if args.qr is None else args.qr
+
+    if args.week:
+        b = bounds()
+        started = time.monotonic()
+        lines = print_week(
+            b.week_start, b.week_end,
+            dated_tasks(db, b.iso["week_start"], b.iso["week_end"]), args.printer, qr,
+            args.layout or WEEK_LAYOUT
+        )
+        if not _drain():
+            return 1
+        print(f"{lines} lines in {time.monotonic() - started:.2f}s", file=sys.stderr)
+        return 0
+
+    failed = 0
+    for ref in args.ids:
+        ticket_id = _resolve(db, ref)
+        t = ticket_id and (
+            db.execute("SELECT * FROM tickets WHERE id=?", (ticket_id,)).fetchone()
+            or get_occurrence(db, ticket_id)
+        )
+        if not t:
+            print(f"no ticket matches '{ref}'", file=sys.stderr)
+            failed += 1
+            continue
+        print_ticket(t, args.printer, qr)
+    if not _drain():
+        return 1
+    return 1 if failed else 0
+
+
+def cmd_bulk(db, args):
+    """Add one ticket per line: title | priority | due | tags
+
+    Everything goes in a single transaction, so a bad line adds nothing.
+    """
+    count = 0
+    for lineno, line in enumerate(args.file, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = [f.strip() for f in line.split("|")] + [""] * 3
+        title, priority, due, tags = fields[:4]
+        try:
+            _add(db, title, int(priority or 2), due or None, tags or None)
+        except ValueError as e:
+            db.rollback()
+            print(f"line {lineno}: {e}", file=sys.stderr)
+            return 1
+        count += 1
+    db.commit()
+    print(f"added {count} tickets")
+    return 0
+
+
+def cmd_backup(db, args):
+    if args.list:
+        for path in list_snapshots():
+            print(path)
+        return 0
+    try:
+        result = backup_now()
+    except BackupError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{result['path']}  {result['pages']} pages  {result['duration']:.2f}s")
+    return 0
+
+
+def cmd_restore(db, args):
+    try:
+        pages = restore(args.snapshot, args.target)
+    except BackupError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"restored {pages} pages into {args.target}")
+    return 0
+
+
+def cmd_vendor(db, args):
+    from modules.assets import vendor
+
+    try:
+        fetched = vendor(args.force)
+    except OSError as e:
+        print(f"download failed: {e}", file=sys.stderr)
+        return 1
+    for path in fetched:
+        print(path)
+    print(f"fetched {len(fetched)} files")
+    return 0
+
+
+def cmd_hash_password(db, args):
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Again: "):
+        print("passwords differ", file=sys.stderr)
+        return 1
+    print(f"TICKETS_PASS_HASH={hash_password(password)}")
+    return 0
+
+
+def cmd_token(db, args):
+    scopes = [s.strip() for s in args.scopes.split(",") if s.strip()]
+    try:
+        print(issue_token(scopes, args.days))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_dead_letters(db, args):
+    from modules import notify
+    from modules.print import dead_letters, retry_dead_letters
+
+    if args.retry:
+        print(f"requeued {retry_dead_letters(db)} print jobs and {notify.retry_dead_letters(db)} messages")
+        return 0 if _drain() else 1
+    rows = [(r["printer"], r) for r in dead_letters(db)] + [(r["sink"], r) for r in notify.dead_letters(db)]
+    if not rows:
+        print("No dead letters.")
+    for name, row in rows:
+        print(f"{row['id']:>4}  {row['failed_at']}  {name:<10}  {row['attempts']} tries  {row['error']}")
+    return 0
+
+
+def cmd_archive(db, args):
+    moved = archive_closed(db, args.days)
+    print(f"archived {moved} tickets")
+
+
+# ==================================================
+# ENTRY POINT
+# ==================================================
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="tear-off", description="Printable task & ticket system")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    pa = sub.add_parser("add", help="Add a ticket")
+    pa.add_argument("title")
+    pa.add_argument("--priority", type=int, default=2)
+    pa.add_argument("--due", help="YYYY-MM-DD or YYYY-MM-DDTHH:MM")
+    pa.add_argument("--tags", help="comma-separated (default TICKETS_DEFAULT_TAGS)")
+    pa.add_argument("--notes")
+    pa.add_argument("--recurrence", default="none", choices=["none", *RULES])
+    pa.set_defaults(func=cmd_add)
+
+    pl = sub.add_parser("list", help="List open tickets")
+    pl.add_argument("--week", action="store_true", help="only this week, with recurring occurrences")
+    pl.add_argument("--tag")
+    pl.set_defaults(func=cmd_list)
+
+    pd = sub.add_parser("done", help="Close tickets by ID or unique ID prefix")
+    pd.add_argument("ids", nargs="+")
+    pd.set_defaults(func=cmd_done)
+
+    pp = sub.add_parser("print", help="Print tickets or this week's sheet")
+    group = pp.add_mutually_exclusive_group(required=True)
+    group.add_argument("ids", nargs="*", default=[])
+    group.add_argument("--week", action="store_true")
+    pp.add_argument("--printer", help="print everything on this printer instead of routing by tag")
+    pp.add_argument("--layout", choices=["full", "compact"],
+                    help="week sheet layout (default TICKETS_WEEK_LAYOUT)")
+    pp.add_argument("--qr", action=argparse.BooleanOptionalAction, default=None,
+                    help="add a scannable QR code (default TICKETS_PRINT_QR)")
+    pp.set_defaults(func=cmd_print)
+
+    pb = sub.add_parser("bulk", help="Add tickets from lines of 'title | priority | due | tags'")
+    pb.add_argument("file", nargs="?", type=argparse.FileType("r"), default=sys.stdin)
+    pb.set_defaults(func=cmd_bulk)
+
+    par = sub.add_parser("archive", help="Move long-closed tickets into the archive table")
+    par.add_argument("--days", type=int, default=ARCHIVE_DAYS)
+    par.set_defaults(func=cmd_archive)
+
+    pbk = sub.add_parser("backup", help="Take an online snapshot of the database")
+    pbk.add_argument("--list", action="store_true", help="list existing snapshots")
+    pbk.set_defaults(func=cmd_backup)
+
+    prs = sub.add_parser("restore", help="Restore a snapshot into a new database file")
+    prs.add_argument("snapshot")
+    prs.add_argument("target")
+    prs.set_defaults(func=cmd_restore)
+
+    pv = sub.add_parser("vendor", help="Download third-party JS/CSS into static/vendor/")
+    pv.add_argument("--force", action="store_true", help="re-download files already present")
+    pv.set_defaults(func=cmd_vendor)
+
+    pdl = sub.add_parser("dead-letters", help="List (or --retry) print jobs and notifications that failed for good")
+    pdl.add_argument("--retry", action="store_true", help="queue them again on their printers and sinks")
+    pdl.set_defaults(func=cmd_dead_letters)
+
+    phs = sub.add_parser("hash-password", help="Print a TICKETS_PASS_HASH value for a password")
+    phs.set_defaults(func=cmd_hash_password)
+
+    ptk = sub.add_parser("token", help="Issue a signed API token for scripts and replicas")
+    ptk.add_argument("--scopes", default="read", help=f"comma-separated: {','.join(SCOPES)}")
+    ptk.add_argument("--days", type=int, default=TOKEN_DAYS)
+    ptk.set_defaults(func=cmd_token)
+
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db = connect()
+    try:
+        return args.func(db, args) or 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Archive module for ticket system
+Moves long-closed tickets out of the hot tickets table into tickets_archive
+"""
+import os
+import time
+import logging
+import threading
+from datetime import timedelta
+from modules import clock
+from modules.db import connect, now_iso
+from modules.changes import prune_changes
+
+# ==================================================
+# CONFIG
+# ==================================================
+ARCHIVE_DAYS = int(os.getenv("TICKETS_ARCHIVE_DAYS", "30"))
+ARCHIVE_INTERVAL = int(os.getenv("TICKETS_ARCHIVE_INTERVAL", "3600"))  # seconds, 0 disables
+ARCHIVE_BATCH = 500
+VACUUM_PAGES = 256
+
+logger = logging.getLogger(__name__)
+
+
+# ==================================================
+# QUERIES ACROSS BOTH TABLES
+# ==================================================
+
+def closed_tickets(db, q=None):
+    """Closed tickets from the hot table and the archive, newest first"""
+    where, params = "", ()
+    if q:
+        where = "WHERE title LIKE ? OR notes LIKE ? OR tags LIKE ?"
+        params = (f"%{q}%",) * 3
+
+    return db.execute(
+        f"""
+        SELECT * FROM (
+          SELECT id, title, notes, priority, due_at, tags, created_at, closed_at
+          FROM tickets WHERE status = 'closed'
+          UNION ALL
+          SELECT id, title, notes, priority, due_at, tags, created_at, closed_at
+          FROM tickets_archive
+        )
+        {where}
+        ORDER BY closed_at DESC
+        """,
+        params
+    ).fetchall()
+
+
+# ==================================================
+# ARCHIVER
+# ==================================================
+
+def _enable_incremental_vacuum(db):
+    """Switch the file to incremental auto-vacuum (one-off full VACUUM)"""
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("VACUUM")
+        logger.info("Enabled incremental auto-vacuum")
+
+
+def archive_closed(db, older_than_days=ARCHIVE_DAYS):
+    """Move tickets closed before the cutoff into tickets_archive
+
+    Works in small batches, each its own transaction, so the web app
+    and CLI never wait long on the write lock. Returns rows moved.
+    """
+    cutoff = (clock.now() - timedelta(days=older_than_days)).isoformat(timespec="seconds")
+    columns = [
+        row[1] for row in db.execute("PRAGMA table_info(tickets_archive)")
+        if row[1] != "archived_at"
+    ]
+    cols = ", ".join(columns)
+
+    moved = 0
+    while True:
+        with db:
+            ids = [
+                r[0] for r in db.execute(
+                    """
+                    SELECT id FROM tickets
+                    WHERE status = 'closed' AND closed_at < ?
+                    LIMIT ?
+                    """,
+                    (cutoff, ARCHIVE_BATCH)
+                )
+            ]
+            if not ids:
+                break
+            marks = ", ".join("?" * len(ids))
+            db.execute(
+                f"""
+                INSERT OR REPLACE INTO tickets_archive ({cols}, archived_at)
+                SELECT {cols}, ? FROM tickets WHERE id IN ({marks})
+                """,
+                (now_iso(), *ids)
+            )
+            db.execute(f"DELETE FROM tickets WHERE id IN ({marks})", ids)
+        moved += len(ids)
+
+    if moved:
+        _enable_incremental_vacuum(db)
+        db.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+        logger.info(f"Archived {moved} closed tickets (closed before {cutoff})")
+    return moved
+
+
+def _run_forever():
+    while True:
+        try:
+            db = connect()
+            try:
+                archive_closed(db)
+                prune_changes(db)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Archive run failed: {e}")
+        time.sleep(ARCHIVE_INTERVAL)
+
+
+def start_archiver():
+    """Start the background archive thread (no-op if disabled)"""
+    if ARCHIVE_INTERVAL <= 0:
+        logger.info("Archiver disabled (TICKETS_ARCHIVE_INTERVAL=0)")
+        return None
+    t = threading.Thread(target=_run_forever, name="archiver", daemon=True)
+    t.start()
+    return t
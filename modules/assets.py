@@ -0,0 +1,192 @@
+"""
+Static asset pipeline for ticket system
+Fingerprints everything under static/ at startup and serves it from /assets/
+with immutable cache headers and gzip/brotli variants compressed once, so
+repeat page loads need no asset requests. Also compresses HTML/JSON responses.
+Flask is only imported by the functions that need it (cli.py uses vendor()).
+"""
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+import urllib.request
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# ==================================================
+# CONFIG
+# ==================================================
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "static")
+HASH_LEN = 10
+COMPRESS_MIN = 1024  # bytes; smaller responses go out as-is
+COMPRESS_TYPES = (
+    "text/html", "text/css", "text/plain", "application/json",
+    "application/javascript", "text/javascript", "image/svg+xml",
+)
+CACHE_FOREVER = "public, max-age=31536000, immutable"
+
+# Third-party files kept under static/vendor/ (fetch with: python cli.py vendor)
+VENDOR = {
+    "vendor/fullcalendar/index.global.min.js":
+        "https://cdn.jsdelivr.net/npm/fullcalendar@6.1.15/index.global.min.js",
+}
+
+logger = logging.getLogger(__name__)
+
+_manifest = {}   # "styles.css" -> "styles.3f2a9c1b7e.css"
+_files = {}      # "styles.3f2a9c1b7e.css" -> absolute path
+_variants = {}   # (hashed name, encoding) -> bytes
+_lock = threading.Lock()
+
+
+# ==================================================
+# FINGERPRINTING
+# ==================================================
+
+def scan():
+    """Hash every static file; call again after changing files on disk"""
+    manifest, files = {}, {}
+    for dirpath, _, names in os.walk(STATIC_DIR):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:HASH_LEN]
+            root, ext = os.path.splitext(rel)
+            manifest[rel] = f"{root}.{digest}{ext}"
+            files[manifest[rel]] = path
+    with _lock:
+        _manifest.clear()
+        _manifest.update(manifest)
+        _files.clear()
+        _files.update(files)
+        _variants.clear()
+    return manifest
+
+
+def asset_url(filename):
+    """URL for a static file: fingerprinted if known, else the CDN or plain /static/"""
+    hashed = _manifest.get(filename)
+    if hashed:
+        return f"/assets/{hashed}"
+    if filename in VENDOR:
+        return VENDOR[filename]  # not vendored yet; init_assets warned at startup
+
+    from flask import url_for
+    return url_for("static", filename=filename)
+
+
+def missing_vendor():
+    """VENDOR files not yet downloaded into static/vendor/"""
+    return [rel for rel in VENDOR if not os.path.exists(os.path.join(STATIC_DIR, *rel.split("/")))]
+
+
+def vendor(force=False):
+    """Download the VENDOR files into static/vendor/; returns the paths fetched"""
+    fetched = []
+    for rel, url in VENDOR.items():
+        path = os.path.join(STATIC_DIR, *rel.split("/"))
+        if os.path.exists(path) and not force:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            body = resp.read()
+        with open(path + ".part", "wb") as f:
+            f.write(body)
+        os.replace(path + ".part", path)
+        fetched.append(path)
+    return fetched
+
+
+# ==================================================
+# COMPRESSION
+# ==================================================
+
+def _encoding(request):
+    """Best encoding the client accepts: br, gzip or identity"""
+    accepted = request.accept_encodings
+    if brotli and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return "identity"
+
+
+def _compress(body, encoding, best=False):
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else 5)
+    return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+
+def _variant(name, encoding):
+    """File body in an encoding, compressed once at the highest level and kept"""
+    key = (name, encoding)
+    body = _variants.get(key)
+    if body is None:
+        with open(_files[name], "rb") as f:
+            body = f.read()
+        if encoding != "identity":
+            body = _compress(body, encoding, best=True)
+        with _lock:
+            _variants[key] = body
+    return body
+
+
+def serve_asset(name):
+    from flask import Response, abort, request
+
+    if name not in _files:
+        abort(404)
+    headers = {"Cache-Control": CACHE_FOREVER, "ETag": f'"{name}"', "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(name):
+        return Response(status=304, headers=headers)
+
+    mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    encoding = _encoding(request) if mimetype in COMPRESS_TYPES else "identity"
+    body = _variant(name, encoding)
+    if encoding != "identity":
+        if len(body) < len(_variant(name, "identity")):
+            headers["Content-Encoding"] = encoding
+        else:
+            body = _variant(name, "identity")
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli compress rendered pages and JSON"""
+    from flask import request
+
+    if (response.mimetype not in COMPRESS_TYPES or response.direct_passthrough
+            or request.endpoint == "assets"):
+        return response
+    response.vary.add("Accept-Encoding")
+    if (response.is_streamed or "Content-Encoding" in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+
+    body = response.get_data()
+    encoding = _encoding(request)
+    if len(body) < COMPRESS_MIN or encoding == "identity":
+        return response
+    response.set_data(_compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_assets(app):
+    """Fingerprint static files and hook the pipeline into the app"""
+    scan()
+    missing = missing_vendor()
+    if missing:
+        logger.warning(
+            f"Not vendored, loading from the CDN and broken offline: {', '.join(missing)} "
+            "(run: python cli.py vendor, then commit static/vendor/)"
+        )
+    app.add_url_rule("/assets/<path:name>", "assets", serve_asset)
+    app.add_template_global(asset_url)
+    app.after_request(compress_response)
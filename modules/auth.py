@@ -1,21 +1,24 @@
 """
 Authentication module for ticket system
-Handles basic HTTP authentication and authorization
+Accepts a signed session cookie (set by /login), a scoped Bearer token, or
+HTTP Basic credentials; only the first login pays for the password hash
 """
-import os
-import base64
+import hashlib
 from functools import wraps
-from flask import Response, request
+from flask import Response, request, session, redirect, url_for
+from modules.credentials import SCOPES, verify_password, verify_token
 
 # ==================================================
 # CONFIG
 # ==================================================
-USER = os.getenv("TICKETS_USER", "admin")
-PASS = os.getenv("TICKETS_PASS", "admin")
+BASIC_CACHE = 64
+
+# Basic headers that already passed the (slow) password check, by digest
+_basic_ok = set()
 
 
 # ==================================================
-# BASIC AUTH
+# AUTH CHECKS
 # ==================================================
 
 def _unauthorized():
@@ -27,23 +30,55 @@ def _unauthorized():
     )
 
 
-def _check_auth(header):
-    """Verify Basic auth header credentials"""
-    if not header or not header.startswith("Basic "):
-        return False
-    try:
-        decoded = base64.b64decode(header.split(" ", 1)[1]).decode()
-        u, p = decoded.split(":", 1)
-        return u == USER and p == PASS
-    except Exception:
+def _forbidden(scope):
+    return Response(f"Token lacks the '{scope}' scope", 403)
+
+
+def _check_basic(header):
+    """Verify Basic auth header credentials, remembering ones that passed"""
+    key = hashlib.sha256(header.encode()).digest()
+    if key in _basic_ok:
+        return True
+    auth = request.authorization
+    if not auth or auth.type != "basic" or not verify_password(auth.username or "", auth.password or ""):
         return False
+    if len(_basic_ok) >= BASIC_CACHE:
+        _basic_ok.clear()
+    _basic_ok.add(key)
+    return True
+
+
+def current_scopes():
+    """Scopes granted to this request, or None if it isn't authenticated"""
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return verify_token(header[7:].strip())
+    if header.startswith("Basic "):
+        return frozenset(SCOPES) if _check_basic(header) else None
+    if session.get("user"):
+        return frozenset(SCOPES)
+    return None
+
+
+def require_auth(fn=None, scope=None):
+    """Decorator to require authentication on a route
 
+    Use bare or as @require_auth(scope="sync"). Without a scope, GET/HEAD
+    need "read" and everything else "write". Browsers without a session
+    are sent to the login page; other clients (curl's */*, scripts) get 401.
+    """
+    if fn is None:
+        return lambda f: require_auth(f, scope)
 
-def require_auth(fn):
-    """Decorator to require authentication on a route"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        if not _check_auth(request.headers.get("Authorization")):
+        scopes = current_scopes()
+        if scopes is None:
+            if request.method == "GET" and request.accept_mimetypes.best == "text/html":
+                return redirect(url_for("routes.login", next=request.full_path.rstrip("?")))
             return _unauthorized()
+        needed = scope or ("read" if request.method in ("GET", "HEAD") else "write")
+        if needed not in scopes:
+            return _forbidden(needed)
         return fn(*args, **kwargs)
     return wrapper
@@ -0,0 +1,168 @@
+"""
+Backup module for ticket system
+Online snapshots of the live database through the SQLite backup API
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from modules.db import DB_PATH, APP_DIR, connect
+from modules import clock
+from modules import metrics
+
+# ==================================================
+# CONFIG
+# ==================================================
+BACKUP_NAME = os.getenv("TICKETS_BACKUP_DIR", "backups")
+BACKUP_DIR = BACKUP_NAME if os.path.isabs(BACKUP_NAME) else os.path.join(APP_DIR, "..", BACKUP_NAME)
+BACKUP_KEEP = int(os.getenv("TICKETS_BACKUP_KEEP", "7"))
+BACKUP_INTERVAL = int(os.getenv("TICKETS_BACKUP_INTERVAL", "86400"))  # seconds, 0 disables
+BACKUP_PAGES = int(os.getenv("TICKETS_BACKUP_PAGES", "64"))
+BACKUP_SLEEP = 0.005  # pause between steps so writers can get in
+
+SNAPSHOT_PREFIX = "tickets-"
+
+logger = logging.getLogger(__name__)
+
+
+class BackupError(Exception):
+    """Raised when a snapshot fails its integrity check"""
+
+
+# ==================================================
+# HELPERS
+# ==================================================
+
+def _open_ro(path):
+    """Open an existing database read-only (a plain connect would create a missing one)"""
+    return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def _integrity_ok(path):
+    conn = _open_ro(path)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    finally:
+        conn.close()
+
+
+def _copy(src, dst_path):
+    """Copy src into dst_path a few pages at a time; returns pages copied"""
+    pages = {"total": 0}
+
+    def progress(status, remaining, total):
+        pages["total"] = total
+
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst, pages=BACKUP_PAGES, progress=progress, sleep=BACKUP_SLEEP)
+        # A snapshot is one self-contained file: no -wal/-shm sidecars when it is opened read-only
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+    return pages["total"]
+
+
+def list_snapshots(backup_dir=BACKUP_DIR):
+    """Return snapshot paths, newest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(
+        (n for n in os.listdir(backup_dir) if n.startswith(SNAPSHOT_PREFIX) and n.endswith(".db")),
+        reverse=True
+    )
+    return [os.path.join(backup_dir, n) for n in names]
+
+
+def _rotate(backup_dir, keep):
+    for path in list_snapshots(backup_dir)[keep:]:
+        os.remove(path)
+        logger.info(f"Removed old snapshot {path}")
+
+
+# ==================================================
+# BACKUP / RESTORE
+# ==================================================
+
+def backup_now(db_path=DB_PATH, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+    """Take an online snapshot of the database and rotate old ones
+
+    Pages are copied in small steps, so requests keep being served while
+    the backup runs. The snapshot is integrity-checked before it replaces
+    anything. Returns a dict with path, pages and duration.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = clock.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(backup_dir, f"{SNAPSHOT_PREFIX}{stamp}.db")
+    tmp = path + ".part"
+
+    started = time.monotonic()
+    src = connect(db_path)
+    try:
+        pages = _copy(src, tmp)
+    finally:
+        src.close()
+
+    if not _integrity_ok(tmp):
+        os.remove(tmp)
+        raise BackupError(f"Snapshot failed integrity check: {path}")
+
+    os.replace(tmp, path)
+    _rotate(backup_dir, keep)
+
+    duration = time.monotonic() - started
+    metrics.inc("backups")
+    metrics.inc("backup_pages", pages)
+    metrics.set_gauge("backup_last_duration_seconds", round(duration, 3))
+    metrics.set_gauge("backup_last_pages", pages)
+    metrics.set_gauge("backup_last_timestamp", int(time.time()))
+    logger.info(f"Backup written: {path} ({pages} pages in {duration:.2f}s)")
+    return {"path": path, "pages": pages, "duration": duration}
+
+
+def restore(snapshot, target_path):
+    """Restore a snapshot into a fresh database file
+
+    Refuses to overwrite an existing file; point TICKETS_DB at the new
+    path (or swap files while the app is stopped) to switch over.
+    """
+    if not os.path.isfile(snapshot):
+        raise BackupError(f"Snapshot not found: {snapshot}")
+    if os.path.exists(target_path):
+        raise BackupError(f"Restore target already exists: {target_path}")
+    if not _integrity_ok(snapshot):
+        raise BackupError(f"Snapshot failed integrity check: {snapshot}")
+
+    src = _open_ro(snapshot)
+    try:
+        pages = _copy(src, target_path)
+    finally:
+        src.close()
+    logger.info(f"Restored {snapshot} into {target_path} ({pages} pages)")
+    return pages
+
+
+# ==================================================
+# SCHEDULER
+# ==================================================
+
+def _run_forever():
+    while True:
+        time.sleep(BACKUP_INTERVAL)
+        try:
+            backup_now()
+        except Exception as e:
+            metrics.inc("backup_failures")
+            logger.error(f"Scheduled backup failed: {e}")
+
+
+def start_backups():
+    """Start the scheduled backup thread (no-op if disabled)"""
+    if BACKUP_INTERVAL <= 0:
+        logger.info("Scheduled backups disabled (TICKETS_BACKUP_INTERVAL=0)")
+        return None
+    t = threading.Thread(target=_run_forever, name="backup", daemon=True)
+    t.start()
+    return t
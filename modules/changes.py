@@ -0,0 +1,203 @@
+"""
+Change log module for ticket system
+Serves batched deltas from the trigger-fed changes table to replicas and remote clients,
+and turns them into live updates for open pages
+"""
+import os
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from modules.db import connect
+from modules.live import publish, ticket_delta
+from modules.recurrence import occurrence_id
+
+# ==================================================
+# CONFIG
+# ==================================================
+CHANGES_DAYS = int(os.getenv("TICKETS_CHANGES_DAYS", "30"))
+CHANGES_BATCH = 500
+CHANGES_MAX_BATCH = 5000
+LIVE_POLL_SECS = float(os.getenv("TICKETS_SSE_POLL", "1"))
+
+TABLES = ("tickets", "tickets_archive")
+
+logger = logging.getLogger(__name__)
+
+
+def _row(db, table, ticket_id):
+    row = db.execute(f"SELECT * FROM {table} WHERE id=?", (ticket_id,)).fetchone()
+    return {k: row[k] for k in row.keys()} if row else None
+
+
+def _last_seq(db):
+    """Last sequence number handed out, even if the log has since been pruned"""
+    row = db.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'").fetchone()
+    return row[0] if row else 0
+
+
+def _parse_resume(resume):
+    """Split a snapshot resume token "<cursor>:<table>:<last id>" """
+    cursor, _, rest = resume.partition(":")
+    table, sep, after = rest.partition(":")
+    if not cursor.isdigit() or table not in TABLES or not sep:
+        raise ValueError(f"bad resume token '{resume}'")
+    return int(cursor), table, after
+
+
+def _snapshot(db, limit, resume=None):
+    """Every row as an upsert, a page at a time, for clients starting from scratch or too far behind
+
+    Pages walk tickets then tickets_archive in id order. The cursor is the
+    log position when the snapshot started; rows that change while the
+    client is paging come through again in the deltas after it.
+    """
+    if resume:
+        cursor, table, after = _parse_resume(resume)
+    else:
+        cursor, table, after = _last_seq(db), TABLES[0], ""
+
+    pos = TABLES.index(table)
+    changes = []
+    while pos < len(TABLES) and len(changes) < limit:
+        rows = db.execute(
+            f"SELECT * FROM {TABLES[pos]} WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit - len(changes))
+        ).fetchall()
+        for row in rows:
+            changes.append({
+                "table": TABLES[pos],
+                "op": "upsert",
+                "id": row["id"],
+                "row": {k: row[k] for k in row.keys()},
+            })
+        if len(changes) < limit:
+            pos, after = pos + 1, ""
+        else:
+            after = rows[-1]["id"]
+
+    more = pos < len(TABLES)
+    return {
+        "changes": changes,
+        "cursor": cursor,
+        "more": more,
+        "snapshot": True,
+        "resume": f"{cursor}:{TABLES[pos]}:{after}" if more else None,
+    }
+
+
+def changes_since(db, since, limit=CHANGES_BATCH, resume=None):
+    """Return the deltas after cursor `since`, oldest first
+
+    Each entry carries the row as it is now (or op=delete), so repeated
+    changes to one ticket in a batch collapse into one entry. A cursor of
+    0, one older than the pruned log or one ahead of it (the database was
+    restored from a snapshot) gets a paged full snapshot instead; pass each page's `resume` token back to get the next one.
+    """
+    limit = max(1, min(limit, CHANGES_MAX_BATCH))
+    if resume:
+        return _snapshot(db, limit, resume)
+    oldest = db.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+    last = _last_seq(db)
+    if oldest is None:
+        # Empty log: anything before the next sequence number was pruned
+        oldest = last + 1
+    if since <= 0 or since < oldest - 1 or since > last:
+        return _snapshot(db, limit)
+
+    rows = db.execute(
+        "SELECT seq, tbl, ticket_id FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+        (since, limit + 1)
+    ).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for r in rows:
+        latest[(r["tbl"], r["ticket_id"])] = r["seq"]
+
+    changes = []
+    for (table, ticket_id), seq in sorted(latest.items(), key=lambda item: item[1]):
+        row = _row(db, table, ticket_id)
+        changes.append({
+            "seq": seq,
+            "table": table,
+            "op": "upsert" if row else "delete",
+            "id": ticket_id,
+            "row": row,
+        })
+
+    cursor = rows[-1]["seq"] if rows else since
+    return {"changes": changes, "cursor": cursor, "more": more, "snapshot": False}
+
+
+def prune_changes(db, older_than_days=CHANGES_DAYS):
+    """Drop change log entries older than the retention window (changed_at is UTC)"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%dT%H:%M:%S")
+    with db:
+        cur = db.execute("DELETE FROM changes WHERE changed_at < ?", (cutoff,))
+    return cur.rowcount
+
+
+# ==================================================
+# LIVE FEED
+# ==================================================
+# Every writer (web app, CLI, archiver, sqlite3 shell) goes through the
+# triggers, so following the log reaches open pages whoever made the change
+_wake = threading.Event()
+
+
+def wake_live_feed():
+    """Publish this process's own writes now instead of at the next poll"""
+    _wake.set()
+
+
+def publish_changes(db, since):
+    """Publish a live event per ticket changed after `since`; returns the new cursor
+
+    Open tickets go out as "ticket" (added or edited), closed, archived or
+    deleted ones as "closed". A log behind the cursor means the database
+    was restored, so pages are told to reload.
+    """
+    last = _last_seq(db)
+    if last < since:
+        publish("reload")
+        return last
+    rows = db.execute(
+        "SELECT seq, ticket_id FROM changes WHERE seq > ? AND seq <= ? AND tbl='tickets' ORDER BY seq",
+        (since, last)
+    ).fetchall()
+    latest = {r["ticket_id"]: r["seq"] for r in rows}
+    for ticket_id in sorted(latest, key=latest.get):
+        t = db.execute("SELECT * FROM tickets WHERE id=?", (ticket_id,)).fetchone()
+        if t and t["status"] == "open":
+            publish("ticket", **ticket_delta(t))
+        elif t and t["recurrence_id"]:
+            # Pages show the occurrence under its virtual ID
+            publish("closed", id=occurrence_id(t["recurrence_id"], t["occurrence_date"]),
+                    ticket_id=ticket_id, title=t["title"])
+        else:
+            publish("closed", id=ticket_id, title=t["title"] if t else None)
+    return last
+
+
+def _run_forever():
+    db = connect()
+    since = _last_seq(db)
+    while True:
+        _wake.wait(LIVE_POLL_SECS)
+        _wake.clear()
+        try:
+            since = publish_changes(db, since)
+        except sqlite3.Error as e:
+            logger.error(f"Live feed failed: {e}")
+
+
+def start_live_feed():
+    """Start the thread that follows the change log for SSE (no-op if disabled)"""
+    if LIVE_POLL_SECS <= 0:
+        logger.info("Live feed disabled (TICKETS_SSE_POLL=0)")
+        return None
+    t = threading.Thread(target=_run_forever, name="live-feed", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,116 @@
+"""
+Clock service for ticket system
+Every "today" comes from one configured timezone (TICKETS_TZ). The day, week
+and month boundaries are computed once per day and handed to queries as bound
+parameters; crossing midnight notifies hooks and pushes a "day" live event.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from modules.dates import start_of_week, end_of_week, start_of_month, end_of_month
+from modules.live import publish
+
+# ==================================================
+# CONFIG
+# ==================================================
+TZ_NAME = os.getenv("TICKETS_TZ", "")  # e.g. Europe/London; empty = the machine's zone
+
+logger = logging.getLogger(__name__)
+
+try:
+    TZ = ZoneInfo(TZ_NAME) if TZ_NAME else None
+except ZoneInfoNotFoundError:
+    # Windows has no tz database unless the tzdata package is installed
+    logger.error(f"Unknown timezone '{TZ_NAME}' (pip install tzdata?); using local time")
+    TZ = None
+
+
+class Bounds(NamedTuple):
+    """Date boundaries for one day; iso holds them as strings for SQL parameters"""
+    today: date
+    tomorrow: date
+    week_start: date
+    week_end: date
+    month_start: date
+    month_end: date
+    iso: dict
+
+
+def now():
+    """Current wall-clock time in the configured timezone (naive)"""
+    return datetime.now(TZ).replace(tzinfo=None)
+
+
+def _compute(today):
+    days = {
+        "today": today,
+        "tomorrow": today + timedelta(days=1),
+        "week_start": start_of_week(today),
+        "week_end": end_of_week(today),
+        "month_start": start_of_month(today),
+        "month_end": end_of_month(today),
+    }
+    return Bounds(**days, iso={k: d.isoformat() for k, d in days.items()})
+
+
+def _midnight_after(today):
+    """Epoch seconds of the next midnight in the configured timezone"""
+    nxt = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    return nxt.replace(tzinfo=TZ).timestamp() if TZ else nxt.timestamp()
+
+
+# ==================================================
+# DAY TRANSITIONS
+# ==================================================
+
+_lock = threading.Lock()
+_current = None
+_expires = 0.0
+_hooks = []
+
+
+def on_day_change(fn):
+    """Register fn(previous, current) to run when the date rolls over"""
+    _hooks.append(fn)
+    return fn
+
+
+def bounds():
+    """Today's boundaries; between midnights this is one float comparison"""
+    global _current, _expires
+    if time.time() < _expires:
+        return _current
+    with _lock:
+        if time.time() >= _expires:
+            previous = _current
+            _current = _compute(now().date())
+            _expires = _midnight_after(_current.today)
+            if previous and previous.today != _current.today:
+                _transition(previous, _current)
+    return _current
+
+
+def _transition(previous, current):
+    logger.info(f"Day changed: {previous.today} -> {current.today}")
+    for fn in _hooks:
+        try:
+            fn(previous, current)
+        except Exception as e:
+            logger.error(f"Day change hook {fn.__name__} failed: {e}")
+    publish("day", today=current.iso["today"])
+
+
+def _run_forever():
+    while True:
+        bounds()
+        time.sleep(max(1.0, _expires - time.time() + 0.5))
+
+
+def start_clock():
+    """Fire day transitions at midnight even when no request asks for the date"""
+    bounds()
+    threading.Thread(target=_run_forever, name="clock", daemon=True).start()
@@ -0,0 +1,97 @@
+"""
+Credentials module for ticket system
+Password hashing and HMAC-signed API tokens, without Flask so cli.py can issue tokens.
+
+The password hash is deliberately slow and only checked at login or token
+issue; every other request is authenticated by an HMAC over a short token.
+"""
+import os
+import hmac
+import time
+import base64
+import hashlib
+
+# ==================================================
+# CONFIG
+# ==================================================
+USER = os.getenv("TICKETS_USER", "admin")
+PASS = os.getenv("TICKETS_PASS", "admin")
+PASS_HASH = os.getenv("TICKETS_PASS_HASH", "")
+SECRET = os.getenv("TICKETS_SECRET", "dev-secret")
+TOKEN_DAYS = int(os.getenv("TICKETS_TOKEN_DAYS", "365"))
+
+HASH_ITERATIONS = 600_000
+SCOPES = ("read", "write", "sync")
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# ==================================================
+# PASSWORDS
+# ==================================================
+
+def hash_password(password, iterations=HASH_ITERATIONS):
+    """Return a 'pbkdf2_sha256$iterations$salt$hash' string for TICKETS_PASS_HASH"""
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def _check_hash(password, encoded):
+    try:
+        algo, iterations, salt, expected = encoded.split("$")
+        if algo != "pbkdf2_sha256":
+            return False
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), _unb64(salt), int(iterations))
+        return hmac.compare_digest(digest, _unb64(expected))
+    except ValueError:
+        return False
+
+
+def verify_password(user, password):
+    """Check a username/password pair (slow when TICKETS_PASS_HASH is set)"""
+    user_ok = hmac.compare_digest(user.encode(), USER.encode())
+    if PASS_HASH:
+        return _check_hash(password, PASS_HASH) and user_ok
+    return hmac.compare_digest(password.encode(), PASS.encode()) and user_ok
+
+
+# ==================================================
+# TOKENS
+# ==================================================
+
+def _sign(payload):
+    return _b64(hmac.new(SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(scopes=SCOPES, days=TOKEN_DAYS):
+    """Return a token granting `scopes` for `days` days: '<scopes>.<expiry>.<signature>'
+
+    Tokens are stateless; changing TICKETS_SECRET revokes all of them.
+    """
+    if not scopes:
+        raise ValueError("at least one scope is required")
+    if days < 1:
+        raise ValueError("days must be at least 1")
+    unknown = set(scopes) - set(SCOPES)
+    if unknown:
+        raise ValueError(f"unknown scope(s): {', '.join(sorted(unknown))}")
+    payload = f"{'+'.join(sorted(set(scopes)))}.{int(time.time() + days * 86400)}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token):
+    """Return the token's scopes, or None if it is forged, malformed or expired"""
+    payload, _, sig = token.rpartition(".")
+    scopes, _, expiry = payload.partition(".")
+    if not (scopes and expiry.isdigit() and hmac.compare_digest(sig.encode(), _sign(payload).encode())):
+        return None
+    if int(expiry) < time.time():
+        return None
+    return frozenset(scopes.split("+"))
@@ -1,16 +1,19 @@
 """
 Database module for ticket system
 Handles SQLite setup, queries, and schema
+
+Kept free of Flask imports at module level so the CLI can share it
+without paying for the web stack.
 """
 import os
 import sqlite3
 import uuid
-from datetime import datetime
-from flask import g
+from modules import clock
 
 DB_NAME = os.getenv("TICKETS_DB", "tickets.db")
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = DB_NAME if os.path.isabs(DB_NAME) else os.path.join(APP_DIR, "..", DB_NAME)
+BUSY_TIMEOUT_MS = int(os.getenv("TICKETS_BUSY_TIMEOUT_MS", "5000"))
 
 # ==================================================
 # SCHEMA
@@ -25,10 +28,204 @@ CREATE TABLE IF NOT EXISTS tickets (
   status TEXT NOT NULL DEFAULT 'open',
   created_at TEXT NOT NULL,
   closed_at TEXT,
-  tags TEXT
+  tags TEXT,
+  recurrence TEXT NOT NULL DEFAULT 'none',
+  recurrence_time TEXT,
+  recurrence_start TEXT,
+  recurrence_id TEXT,
+  occurrence_date TEXT
+);
+
+-- Closed tickets past TICKETS_ARCHIVE_DAYS, moved out by modules/archive.py
+CREATE TABLE IF NOT EXISTS tickets_archive (
+  id TEXT PRIMARY KEY,
+  title TEXT NOT NULL,
+  notes TEXT,
+  priority INTEGER NOT NULL DEFAULT 2,
+  due_at TEXT,
+  status TEXT NOT NULL DEFAULT 'closed',
+  created_at TEXT NOT NULL,
+  closed_at TEXT,
+  tags TEXT,
+  recurrence TEXT NOT NULL DEFAULT 'none',
+  recurrence_time TEXT,
+  recurrence_start TEXT,
+  recurrence_id TEXT,
+  occurrence_date TEXT,
+  archived_at TEXT NOT NULL
+);
+
+-- Append-only change log for /api/changes and read replicas (fed by TRIGGERS)
+CREATE TABLE IF NOT EXISTS changes (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  tbl TEXT NOT NULL,
+  ticket_id TEXT NOT NULL,
+  op TEXT NOT NULL,
+  changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now'))  -- UTC
+);
+
+-- Aggregates kept current by STATS_TRIGGERS so dashboards read O(days) rows
+CREATE TABLE IF NOT EXISTS stats_open (
+  dim TEXT NOT NULL,          -- day|tag|priority
+  key TEXT NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (dim, key)
+);
+
+CREATE TABLE IF NOT EXISTS stats_daily (
+  day TEXT PRIMARY KEY,
+  created INTEGER NOT NULL DEFAULT 0,
+  closed INTEGER NOT NULL DEFAULT 0
+);
+
+-- Notification batches that ran out of retries (see modules/notify.py)
+CREATE TABLE IF NOT EXISTS notify_dead_letters (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  sink TEXT NOT NULL,
+  messages TEXT NOT NULL,     -- JSON list of message texts
+  error TEXT,
+  attempts INTEGER NOT NULL,
+  failed_at TEXT NOT NULL
+);
+
+-- Print jobs that failed for good (see PrinterWorker in modules/print.py)
+CREATE TABLE IF NOT EXISTS print_dead_letters (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  printer TEXT NOT NULL,
+  ops TEXT NOT NULL,          -- JSON list of [op, arg] pairs
+  layout TEXT,
+  error TEXT,
+  attempts INTEGER NOT NULL,
+  failed_at TEXT NOT NULL
 );
 """
 
+# Columns added after the first release; older databases get them via ALTER TABLE
+# (applied to both tickets and tickets_archive)
+COLUMNS = [
+    ("recurrence", "TEXT NOT NULL DEFAULT 'none'"),
+    ("recurrence_time", "TEXT"),
+    ("recurrence_start", "TEXT"),
+    ("recurrence_id", "TEXT"),
+    ("occurrence_date", "TEXT"),
+]
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_tickets_occurrence
+  ON tickets(recurrence_id, occurrence_date);
+CREATE INDEX IF NOT EXISTS idx_tickets_status_closed
+  ON tickets(status, closed_at);
+CREATE INDEX IF NOT EXISTS idx_archive_closed
+  ON tickets_archive(closed_at);
+CREATE INDEX IF NOT EXISTS idx_archive_occurrence
+  ON tickets_archive(recurrence_id, occurrence_date);
+CREATE INDEX IF NOT EXISTS idx_changes_changed
+  ON changes(changed_at);
+"""
+
+TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_tickets_insert AFTER INSERT ON tickets
+BEGIN INSERT INTO changes (tbl, ticket_id, op) VALUES ('tickets', NEW.id, 'upsert'); END;
+CREATE TRIGGER IF NOT EXISTS trg_tickets_update AFTER UPDATE ON tickets
+BEGIN INSERT INTO changes (tbl, ticket_id, op) VALUES ('tickets', NEW.id, 'upsert'); END;
+CREATE TRIGGER IF NOT EXISTS trg_tickets_delete AFTER DELETE ON tickets
+BEGIN INSERT INTO changes (tbl, ticket_id, op) VALUES ('tickets', OLD.id, 'delete'); END;
+CREATE TRIGGER IF NOT EXISTS trg_archive_insert AFTER INSERT ON tickets_archive
+BEGIN INSERT INTO changes (tbl, ticket_id, op) VALUES ('tickets_archive', NEW.id, 'upsert'); END;
+CREATE TRIGGER IF NOT EXISTS trg_archive_delete AFTER DELETE ON tickets_archive
+BEGIN INSERT INTO changes (tbl, ticket_id, op) VALUES ('tickets_archive', OLD.id, 'delete'); END;
+"""
+
+
+# Open, non-rule tickets are what the open-ticket stats count
+_OPEN = "{r}.status = 'open' AND COALESCE({r}.recurrence, 'none') = 'none'"
+# Splits the comma-separated tags of {source}'s rows into split.tag with
+# instr/substr, so quotes, backslashes or anything else in a tag are just text
+_SPLIT_TAGS = """WITH RECURSIVE split(tag, rest) AS (
+    SELECT '', tags || ',' FROM ({source})
+    UNION ALL
+    SELECT substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1)
+    FROM split WHERE rest != ''
+  )"""
+
+
+def _open_stats(r, sign):
+    """SQL adding sign (+1/-1) to the open stats for row alias r (NEW/OLD)"""
+    cond = _OPEN.format(r=r)
+    upsert = "ON CONFLICT(dim, key) DO UPDATE SET count = count + excluded.count;"
+    return f"""
+  INSERT INTO stats_open (dim, key, count)
+    SELECT 'priority', {r}.priority, {sign} WHERE {cond} {upsert}
+  INSERT INTO stats_open (dim, key, count)
+    SELECT 'day', date({r}.due_at), {sign} WHERE {cond} AND date({r}.due_at) IS NOT NULL {upsert}
+  INSERT INTO stats_open (dim, key, count)
+    {_SPLIT_TAGS.format(source=f"SELECT {r}.tags AS tags WHERE {cond} AND {r}.tags IS NOT NULL")}
+    SELECT 'tag', tag, {sign} FROM split WHERE tag != '' {upsert}"""
+
+
+def _closed_stats(r, sign):
+    """SQL adding sign to the closed-per-day count if row alias r is closed"""
+    return f"""
+  INSERT INTO stats_daily (day, closed)
+    SELECT date({r}.closed_at), {sign}
+    WHERE {r}.status = 'closed' AND {r}.closed_at IS NOT NULL
+    ON CONFLICT(day) DO UPDATE SET closed = closed + excluded.closed;"""
+
+
+STATS_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_stats_insert AFTER INSERT ON tickets
+BEGIN
+  INSERT INTO stats_daily (day, created) VALUES (date(NEW.created_at), 1)
+    ON CONFLICT(day) DO UPDATE SET created = created + 1;
+  {_open_stats("NEW", 1)}
+  {_closed_stats("NEW", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_stats_update AFTER UPDATE ON tickets
+BEGIN
+  {_open_stats("OLD", -1)}
+  {_open_stats("NEW", 1)}
+  {_closed_stats("OLD", -1)}
+  {_closed_stats("NEW", 1)}
+  DELETE FROM stats_open WHERE count <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_stats_delete AFTER DELETE ON tickets
+BEGIN
+  {_open_stats("OLD", -1)}
+  DELETE FROM stats_open WHERE count <= 0;
+END;
+"""
+
+# Full recount, used when the stats tables are first created (or a replica resyncs)
+STATS_REBUILD = f"""
+DELETE FROM stats_open;
+DELETE FROM stats_daily;
+INSERT INTO stats_open (dim, key, count)
+  SELECT 'priority', priority, COUNT(*) FROM tickets t WHERE {_OPEN.format(r="t")}
+  GROUP BY priority;
+INSERT INTO stats_open (dim, key, count)
+  SELECT 'day', date(due_at), COUNT(*) FROM tickets t
+  WHERE {_OPEN.format(r="t")} AND date(due_at) IS NOT NULL
+  GROUP BY date(due_at);
+INSERT INTO stats_open (dim, key, count)
+  {_SPLIT_TAGS.format(source=f"SELECT tags FROM tickets t WHERE {_OPEN.format(r='t')} AND t.tags IS NOT NULL")}
+  SELECT 'tag', tag, COUNT(*) FROM split WHERE tag != ''
+  GROUP BY tag;
+INSERT INTO stats_daily (day, created, closed)
+  SELECT day, SUM(created), SUM(closed) FROM (
+    SELECT date(created_at) AS day, 1 AS created, 0 AS closed FROM tickets
+    UNION ALL SELECT date(created_at), 1, 0 FROM tickets_archive
+    UNION ALL SELECT date(closed_at), 0, 1 FROM tickets
+      WHERE status = 'closed' AND closed_at IS NOT NULL
+    UNION ALL SELECT date(closed_at), 0, 1 FROM tickets_archive
+      WHERE closed_at IS NOT NULL
+  )
+  WHERE day IS NOT NULL
+  GROUP BY day;
+"""
+
+_ready = set()
+
+
 def generate_ticket_id():
     """Generate a new UUID for a ticket"""
     return str(uuid.uuid4())
@@ -38,17 +235,80 @@ def generate_ticket_id():
 # DATABASE HELPERS
 # ==================================================
 
+def connect(path=DB_PATH):
+    """Open a connection that is safe to share the file with other processes
+
+    WAL lets the web app keep reading while the CLI or a cron job writes,
+    and the busy timeout makes writers wait instead of failing.
+    """
+    db = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    init_schema(db)
+    return db
+
+
 def get_db():
-    """Get database connection, create schema if needed"""
+    """Get database connection for the current request"""
+    from flask import g
+
     if "db" not in g:
-        g.db = sqlite3.connect(DB_PATH)
-        g.db.row_factory = sqlite3.Row
-        g.db.executescript(SCHEMA)
+        g.db = connect()
     return g.db
 
 
+def init_schema(db):
+    """Create tables, add any missing columns and build indexes
+
+    Only does the work once per database file per process.
+    """
+    path = db.execute("PRAGMA database_list").fetchone()[2]
+    if path and path in _ready:
+        return
+
+    new_stats = not db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='stats_open'"
+    ).fetchone()
+    # Older stats triggers: json_each choked on backslashes in tags, and
+    # date(due_at) is NULL for a due_at like "Friday"
+    stale_stats = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name LIKE 'trg_stats_%' "
+        "AND (sql LIKE '%json_each%' OR sql NOT LIKE '%.due_at) IS NOT NULL%')"
+    ).fetchone()
+    if stale_stats:
+        for name in ("trg_stats_insert", "trg_stats_update", "trg_stats_delete"):
+            db.execute(f"DROP TRIGGER IF EXISTS {name}")
+    db.executescript(SCHEMA)
+    for table in ("tickets", "tickets_archive"):
+        existing = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+        for name, ddl in COLUMNS:
+            if name not in existing:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+    db.executescript(INDEXES)
+    db.executescript(TRIGGERS)
+    db.executescript(STATS_TRIGGERS)
+    if new_stats or stale_stats:
+        with db:
+            rebuild_stats(db)
+    if path:
+        _ready.add(path)
+
+
+def rebuild_stats(db):
+    """Recompute the stats tables from scratch
+
+    Runs statement by statement so it joins the caller's transaction
+    (executescript would commit it).
+    """
+    for statement in STATS_REBUILD.split(";"):
+        if statement.strip():
+            db.execute(statement)
+
+
 def close_db(_):
     """Close database connection (teardown handler)"""
+    from flask import g
+
     db = g.pop("db", None)
     if db:
         db.close()
@@ -56,7 +316,7 @@ def close_db(_):
 
 def now_iso():
     """Return current datetime in ISO format"""
-    return datetime.now().isoformat(timespec="seconds")
+    return clock.now().isoformat(timespec="seconds")
 
 
 def normalize_tags(raw):
@@ -69,3 +329,33 @@ def normalize_tags(raw):
             for t in raw.split(",") if t.strip()
         )
     )
+
+
+# ==================================================
+# TICKET WRITES
+# ==================================================
+
+def insert_ticket(db, title, priority=2, due_at=None, tags=None, notes=None,
+                  recurrence="none", recurrence_time=None, recurrence_start=None):
+    """Insert a ticket and return its new ID (caller commits)"""
+    ticket_id = generate_ticket_id()
+    db.execute(
+        """
+        INSERT INTO tickets
+        (id, title, notes, priority, due_at, tags, created_at,
+         recurrence, recurrence_time, recurrence_start)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (ticket_id, title, notes, priority, due_at, tags, now_iso(),
+         recurrence, recurrence_time, recurrence_start)
+    )
+    return ticket_id
+
+
+def close_ticket(db, ticket_id):
+    """Mark a ticket closed; returns True if it was open (caller commits)"""
+    cur = db.execute(
+        "UPDATE tickets SET status='closed', closed_at=? WHERE id=? AND status='open'",
+        (now_iso(), ticket_id)
+    )
+    return cur.rowcount > 0
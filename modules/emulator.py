@@ -0,0 +1,417 @@
+"""
+ESC/POS printer emulator for the ticket system
+Listens like a network receipt printer (raw TCP, port 9100) and turns the
+incoming ESC/POS stream into a structured transcript, so printing can be
+tested and timed on machines without a BIXOLON attached.
+
+    python -m modules.emulator --port 9100 --line-speed 40 --out transcripts/
+    TICKETS_PRINTERS=emu=network:127.0.0.1:9100 python app.py
+"""
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+
+logger = logging.getLogger(__name__)
+
+ESC, GS, DLE, LF = 0x1B, 0x1D, 0x10, 0x0A
+
+# ESC commands that take a fixed number of argument bytes (and are otherwise ignored)
+ESC_ARGS = {
+    ord("-"): 1, ord("2"): 0, ord("3"): 1, ord("G"): 1, ord("M"): 1,
+    ord("t"): 1, ord("J"): 1, ord("p"): 3, ord("{"): 1, ord("V"): 1,
+    ord("c"): 2, ord("R"): 1, ord("U"): 1,
+}
+GS_ARGS = {
+    ord("B"): 1, ord("H"): 1, ord("f"): 1, ord("h"): 1, ord("w"): 1,
+    ord("L"): 2, ord("W"): 2, ord("b"): 1,
+}
+
+
+# ==================================================
+# TRANSCRIPT
+# ==================================================
+
+class Transcript:
+    """Everything one print job (one TCP connection) produced"""
+
+    def __init__(self):
+        self.lines = []
+        self.cuts = 0
+        self.bytes = 0
+        self.dropped_lines = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def duration(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    def text(self):
+        return "\n".join(line["text"] for line in self.lines)
+
+    def to_dict(self):
+        return {
+            "lines": self.lines,
+            "cuts": self.cuts,
+            "bytes": self.bytes,
+            "dropped_lines": self.dropped_lines,
+            "duration": round(self.duration, 4),
+        }
+
+    def to_image(self, path, columns=48):
+        """Render the transcript to a PNG (needs Pillow, which python-escpos pulls in)"""
+        from PIL import Image, ImageDraw
+
+        cell_w, cell_h = 12, 24
+        height = sum(cell_h * line["height"] for line in self.lines) + cell_h * self.cuts + cell_h
+        img = Image.new("1", (columns * cell_w, max(height, cell_h)), 1)
+        draw = ImageDraw.Draw(img)
+
+        y = 0
+        for line in self.lines:
+            w = len(line["text"]) * cell_w * line["width"]
+            x = {"left": 0, "center": (img.width - w) // 2, "right": img.width - w}[line["align"]]
+            # Draw small then scale so double width/height look like the real thing
+            glyphs = Image.new("1", (max(len(line["text"]) * cell_w, 1), cell_h), 1)
+            gd = ImageDraw.Draw(glyphs)
+            gd.text((0, 4), line["text"], fill=0)
+            if line["bold"]:
+                gd.text((1, 4), line["text"], fill=0)
+            glyphs = glyphs.resize((max(w, 1), cell_h * line["height"]))
+            img.paste(glyphs, (max(x, 0), y))
+            y += cell_h * line["height"]
+            if line.get("cut"):
+                draw.line((0, y + cell_h // 2, img.width, y + cell_h // 2), fill=0)
+                y += cell_h
+        img.save(path)
+        return path
+
+
+# ==================================================
+# PARSER
+# ==================================================
+
+class EscposParser:
+    """Incremental ESC/POS parser: feed() bytes, completed lines land in the transcript
+
+    Commands split across TCP reads are kept until the rest arrives.
+    """
+
+    def __init__(self, transcript, on_line=None, on_status=None):
+        self.t = transcript
+        self.on_line = on_line
+        self.on_status = on_status
+        self.pending = bytearray()
+        self.current = bytearray()
+        self._reset()
+
+    def _reset(self):
+        self.align = "left"
+        self.bold = False
+        self.width = 1
+        self.height = 1
+
+    def _emit(self):
+        line = {
+            "text": self.current.decode("cp437", errors="replace"),
+            "align": self.align,
+            "bold": self.bold,
+            "width": self.width,
+            "height": self.height,
+        }
+        self.current = bytearray()
+        if self.on_line and not self.on_line(line):
+            self.t.dropped_lines += 1
+            return
+        self.t.lines.append(line)
+
+    def _cut(self):
+        if self.current:
+            self._emit()
+        self.t.cuts += 1
+        if self.t.lines:
+            self.t.lines[-1]["cut"] = True
+
+    def feed(self, data):
+        self.t.bytes += len(data)
+        buf = self.pending + data
+        i = 0
+        while i < len(buf):
+            used = self._command(buf, i)
+            if used is None:
+                break  # incomplete command, wait for more bytes
+            i += used
+        self.pending = bytearray(buf[i:])
+
+    def close(self):
+        if self.current:
+            self._emit()
+        self.t.finished = time.monotonic()
+
+    def _command(self, buf, i):
+        """Handle the command at buf[i]; return bytes consumed, or None if incomplete"""
+        b = buf[i]
+        remaining = len(buf) - i
+
+        if b == LF:
+            self._emit()
+            return 1
+        if b == 0x0D:
+            return 1
+        if b not in (ESC, GS, DLE):
+            self.current.append(b)
+            return 1
+        if remaining < 2:
+            return None
+
+        cmd = buf[i + 1]
+        if b == DLE:
+            # DLE EOT n: real-time status request
+            if cmd == 0x04:
+                if remaining < 3:
+                    return None
+                if self.on_status:
+                    self.on_status(buf[i + 2])
+                return 3
+            return 2
+
+        if b == ESC:
+            if cmd == ord("@"):
+                self._reset()
+                return 2
+            if cmd in (ord("a"), ord("E"), ord("!"), ord("d")):
+                if remaining < 3:
+                    return None
+                n = buf[i + 2]
+                if cmd == ord("a"):
+                    self.align = {0: "left", 1: "center", 2: "right", 48: "left", 49: "center", 50: "right"}.get(n, "left")
+                elif cmd == ord("E"):
+                    self.bold = bool(n & 1)
+                elif cmd == ord("!"):
+                    self.bold = bool(n & 0x08)
+                    self.height = 2 if n & 0x10 else 1
+                    self.width = 2 if n & 0x20 else 1
+                elif cmd == ord("d"):
+                    for _ in range(n):
+                        self._emit()
+                return 3
+            n_args = ESC_ARGS.get(cmd, 0)
+            if remaining < 2 + n_args:
+                return None
+            return 2 + n_args
+
+        # GS
+        if cmd == ord("!"):
+            if remaining < 3:
+                return None
+            n = buf[i + 2]
+            self.width = (n >> 4) + 1
+            self.height = (n & 0x0F) + 1
+            return 3
+        if cmd == ord("V"):
+            if remaining < 3:
+                return None
+            m = buf[i + 2]
+            if m in (65, 66, 97, 98):
+                if remaining < 4:
+                    return None
+                self._cut()
+                return 4
+            self._cut()
+            return 3
+        if cmd == ord("("):
+            # GS ( x pL pH data... (QR codes, barcodes settings)
+            if remaining < 5:
+                return None
+            size = buf[i + 3] + buf[i + 4] * 256
+            if remaining < 5 + size:
+                return None
+            return 5 + size
+        if cmd == ord("v"):
+            # GS v 0 m xL xH yL yH raster data
+            if remaining < 8:
+                return None
+            size = (buf[i + 4] + buf[i + 5] * 256) * (buf[i + 6] + buf[i + 7] * 256)
+            if remaining < 8 + size:
+                return None
+            return 8 + size
+        if cmd == ord("k"):
+            # GS k m d1...dk NUL (barcode, function A)
+            end = buf.find(b"\x00", i + 3)
+            if end == -1:
+                return None
+            return end - i + 1
+        n_args = GS_ARGS.get(cmd, 0)
+        if remaining < 2 + n_args:
+            return None
+        return 2 + n_args
+
+
+# ==================================================
+# EMULATED PRINTER
+# ==================================================
+
+class EmulatedPrinter:
+    """A TCP receipt printer with configurable speed, buffer and paper
+
+    line_speed:   printed lines per second (0 = instant)
+    buffer_size:  bytes read from the socket at a time; together with
+                  line_speed this makes a slow printer push back on senders
+    paper_lines:  lines of paper loaded (None = endless); once used up the
+                  printer reports paper out and drops further lines
+
+    Answers DLE EOT real-time status requests, so cover_open / paper_out
+    can be toggled to exercise status monitoring.
+    """
+
+    def __init__(self, host="127.0.0.1", port=9100, line_speed=0, buffer_size=4096,
+                 paper_lines=None, out_dir=None):
+        self.host = host
+        self.port = port
+        self.line_speed = line_speed
+        self.buffer_size = buffer_size
+        self.paper_lines = paper_lines
+        self.out_dir = out_dir
+        self.jobs = []
+        self.lines_printed = 0
+        self.cover_open = False
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+
+    # ---- paper ----
+    @property
+    def paper_out(self):
+        return self.paper_lines is not None and self.lines_printed >= self.paper_lines
+
+    def load_paper(self, lines=None):
+        """Refill paper; None means an endless roll"""
+        with self._lock:
+            self.paper_lines = lines
+            self.lines_printed = 0
+
+    def status_byte(self, n):
+        """Response to DLE EOT n (fixed bits 0x12 plus the flagged conditions)"""
+        stopped = self.paper_out or self.cover_open
+        if n == 1:
+            return 0x12 | (0x08 if stopped else 0)
+        if n == 2:
+            return 0x12 | (0x04 if self.cover_open else 0) | (0x20 if self.paper_out else 0)
+        if n == 4:
+            return 0x12 | (0x60 if self.paper_out else 0)
+        return 0x12
+
+    def _print_line(self, line):
+        with self._lock:
+            if self.paper_out or self.cover_open:
+                return False
+            self.lines_printed += 1
+        if self.line_speed:
+            time.sleep(1 / self.line_speed)
+        return True
+
+    # ---- server ----
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen()
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, name="escpos-emulator", daemon=True)
+        self._thread.start()
+        logger.info(f"ESC/POS emulator listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _serve(self):
+        while self._sock:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        transcript = Transcript()
+        parser = EscposParser(
+            transcript,
+            on_line=self._print_line,
+            on_status=lambda n: conn.sendall(bytes([self.status_byte(n)]))
+        )
+        try:
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size)
+            while True:
+                data = conn.recv(self.buffer_size)
+                if not data:
+                    break
+                parser.feed(data)
+        except OSError as e:
+            logger.warning(f"Emulator connection error: {e}")
+        finally:
+            conn.close()
+            parser.close()
+            self._finish(transcript)
+
+    def _finish(self, transcript):
+        if not transcript.lines and not transcript.cuts and not transcript.dropped_lines:
+            return  # status poll only, not a print job
+        with self._lock:
+            self.jobs.append(transcript)
+            n = len(self.jobs)
+        logger.info(
+            f"Job {n}: {len(transcript.lines)} lines, {transcript.cuts} cuts, "
+            f"{transcript.bytes} bytes in {transcript.duration:.3f}s"
+            + (f", {transcript.dropped_lines} lines lost (paper out)" if transcript.dropped_lines else "")
+        )
+        if self.out_dir:
+            os.makedirs(self.out_dir, exist_ok=True)
+            base = os.path.join(self.out_dir, f"job-{n:04d}")
+            with open(base + ".json", "w") as f:
+                json.dump(transcript.to_dict(), f, indent=2)
+            try:
+                transcript.to_image(base + ".png")
+            except ImportError:
+                pass
+
+    def wait_for_jobs(self, count, timeout=10):
+        """Block until at least count jobs have finished; returns True if they did"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if len(self.jobs) >= count:
+                    return True
+            time.sleep(0.01)
+        return False
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="ESC/POS network printer emulator")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=9100)
+    p.add_argument("--line-speed", type=float, default=0, help="lines per second (0 = instant)")
+    p.add_argument("--buffer-size", type=int, default=4096, help="receive buffer in bytes")
+    p.add_argument("--paper-lines", type=int, default=None, help="lines before paper out")
+    p.add_argument("--out", default=None, help="directory for JSON/PNG transcripts")
+    args = p.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    printer = EmulatedPrinter(
+        args.host, args.port, args.line_speed, args.buffer_size, args.paper_lines, args.out
+    ).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        printer.stop()
+
+
+if __name__ == "__main__":
+    main()
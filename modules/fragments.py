@@ -0,0 +1,42 @@
+"""
+Ticket card fragment cache for ticket system
+Pages render each ticket through ticket_card(); a card is rendered once per
+(template, theme, row contents) and reused until the row changes, so a page
+costs roughly one render per changed ticket instead of one per listed ticket
+"""
+import os
+from functools import lru_cache
+from flask import current_app
+from markupsafe import Markup
+from modules import metrics
+from modules.theme import get_theme
+
+# ==================================================
+# CONFIG
+# ==================================================
+FRAGMENT_CACHE = int(os.getenv("TICKETS_FRAGMENT_CACHE", "4096"))  # cards kept, 0 disables
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE)
+def _render(template, theme, keys, values):
+    """Render one card; the row's values are its version, so any edit is a new key"""
+    t = dict(zip(keys, values))
+    return Markup(current_app.jinja_env.get_template(template).render(t=t, theme=theme))
+
+
+def ticket_card(template, t):
+    """Cached HTML for one ticket (sqlite3.Row or occurrence dict) in a card template"""
+    keys = tuple(t.keys())
+    return _render(template, get_theme(), keys, tuple(t[k] for k in keys))
+
+
+def report():
+    """Copy the cache counters into the metrics registry"""
+    info = _render.cache_info()
+    metrics.set_gauge("fragment_cache_hits", info.hits)
+    metrics.set_gauge("fragment_cache_misses", info.misses)
+    metrics.set_gauge("fragment_cache_size", info.currsize)
+
+
+def init_fragments(app):
+    app.add_template_global(ticket_card)
@@ -0,0 +1,99 @@
+"""
+Live update module for ticket system
+Broadcasts small ticket deltas to connected browsers over Server-Sent Events
+"""
+import os
+import json
+import queue
+import logging
+import threading
+from collections import deque
+
+# ==================================================
+# CONFIG
+# ==================================================
+HEARTBEAT_SECS = int(os.getenv("TICKETS_SSE_HEARTBEAT", "15"))
+BACKLOG_SIZE = int(os.getenv("TICKETS_SSE_BACKLOG", "200"))
+SUBSCRIBER_QUEUE = 100
+
+logger = logging.getLogger(__name__)
+
+# ==================================================
+# BROKER
+# ==================================================
+_lock = threading.Lock()
+_subscribers = set()
+_backlog = deque(maxlen=BACKLOG_SIZE)
+_next_id = 1
+
+
+def ticket_delta(t):
+    """Return the fields a client needs to patch a ticket card"""
+    return {
+        "id": t["id"],
+        "title": t["title"],
+        "notes": t["notes"],
+        "priority": t["priority"],
+        "due_at": t["due_at"],
+        "tags": t["tags"],
+        "recurrence": t["recurrence"],
+    }
+
+
+def publish(kind, **data):
+    """Send an event (ticket, closed, printed, printer, day) to every subscriber"""
+    global _next_id
+    with _lock:
+        event = (_next_id, kind, json.dumps(data))
+        _next_id += 1
+        _backlog.append(event)
+        subscribers = list(_subscribers)
+
+    for q in subscribers:
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop it, EventSource reconnects and replays
+            _unsubscribe(q)
+            logger.warning("SSE subscriber queue full, dropping client")
+
+
+def _unsubscribe(q):
+    with _lock:
+        _subscribers.discard(q)
+
+
+def _format(event):
+    event_id, kind, payload = event
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+def stream(last_event_id=None):
+    """Yield SSE frames for one client until it disconnects
+
+    A reconnecting client sends Last-Event-ID; anything it missed is
+    replayed from the backlog, or it is told to reload if the gap is
+    older than the backlog holds (or the server restarted).
+    """
+    q = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+    with _lock:
+        _subscribers.add(q)
+        missed = []
+        if last_event_id is not None:
+            oldest = _backlog[0][0] if _backlog else _next_id
+            if last_event_id + 1 < oldest or last_event_id >= _next_id:
+                missed = [(_next_id - 1, "reload", "{}")]
+            else:
+                missed = [e for e in _backlog if e[0] > last_event_id]
+
+    try:
+        yield "retry: 3000\n\n"
+        for event in missed:
+            yield _format(event)
+        while True:
+            try:
+                yield _format(q.get(timeout=HEARTBEAT_SECS))
+            except queue.Empty:
+                yield ": ping\n\n"
+    finally:
+        _unsubscribe(q)
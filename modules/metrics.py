@@ -0,0 +1,50 @@
+"""
+Metrics module for ticket system
+In-process counters and gauges, exposed at /metrics in Prometheus text format
+"""
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name, value=1, **labels):
+    """Add to a counter"""
+    with _lock:
+        k = _key(name, labels)
+        _counters[k] = _counters.get(k, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its latest value"""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def get(name, **labels):
+    """Return a counter or gauge value (0 if never set)"""
+    k = _key(name, labels)
+    with _lock:
+        return _gauges.get(k, _counters.get(k, 0))
+
+
+def render():
+    """Render every metric in Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        items = [("counter", _counters), ("gauge", _gauges)]
+        for kind, store in items:
+            seen = set()
+            for (name, labels), value in sorted(store.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE tickets_{name} {kind}")
+                    seen.add(name)
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                label_str = f"{{{label_str}}}" if label_str else ""
+                lines.append(f"tickets_{name}{label_str} {value}")
+    return "\n".join(lines) + "\n"
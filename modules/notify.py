@@ -0,0 +1,281 @@
+"""
+Notification sinks for ticket system
+Telegram, SMS and webhook "printers": they take the same rendered jobs as real
+printers (TICKETS_PRINTERS="phone=telegram:<chat id>") and deliver them from one
+asyncio loop in the background, batched, rate limited and retried. Batches that
+run out of retries land in the notify_dead_letters table.
+"""
+import os
+import re
+import json
+import time
+import queue
+import random
+import asyncio
+import logging
+import threading
+import urllib.error
+import urllib.request
+from modules import metrics
+from modules.db import connect, now_iso
+from modules.live import publish
+
+# ==================================================
+# CONFIG
+# ==================================================
+TELEGRAM_TOKEN = os.getenv("TICKETS_TELEGRAM_TOKEN", "")
+TELEGRAM_API = os.getenv("TICKETS_TELEGRAM_API", "https://api.telegram.org").rstrip("/")
+SMS_URL = os.getenv("TICKETS_SMS_URL", "")      # gateway taking POST {"to", "text"}
+SMS_TOKEN = os.getenv("TICKETS_SMS_TOKEN", "")
+NOTIFY_RATE = float(os.getenv("TICKETS_NOTIFY_RATE", "1"))          # batches per second per sink
+NOTIFY_BATCH_SECS = float(os.getenv("TICKETS_NOTIFY_BATCH_SECS", "2"))  # wait to gather a batch
+NOTIFY_RETRIES = int(os.getenv("TICKETS_NOTIFY_RETRIES", "5"))
+NOTIFY_TIMEOUT = 10
+BACKOFF_MAX = 60
+BATCH_MAX = 20
+BATCH_SEP = "\n\n---\n\n"  # between messages sent as one text
+
+# Longest single delivery each kind accepts, in characters
+MAX_CHARS = {"telegram": 4096, "sms": 640, "webhook": 65536}
+SINK_KINDS = tuple(MAX_CHARS)
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    """A failed delivery; permanent ones (bad request, bad token) are not retried"""
+
+    def __init__(self, message, permanent=False, retry_after=None):
+        super().__init__(message)
+        self.permanent = permanent
+        self.retry_after = retry_after
+
+
+# ==================================================
+# RENDERING & TRANSPORT
+# ==================================================
+
+def job_text(job):
+    """Turn a print job into message text
+
+    Paper padding and separator rules mean nothing in a chat, so lines
+    are stripped and rules dropped; a QR code becomes its payload.
+    """
+    lines = []
+    for op, arg in job.ops:
+        if op in ("text", "heading"):
+            line = arg.strip()
+            lines.append("" if line and not line.strip("*=-") else line)
+        elif op == "qr":
+            lines.append(arg)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _request(name, kind, target, texts):
+    """URL, JSON body and headers delivering a batch of texts to one sink"""
+    if kind == "telegram":
+        url = f"{TELEGRAM_API}/bot{TELEGRAM_TOKEN}/sendMessage"
+        return url, {"chat_id": target, "text": BATCH_SEP.join(texts)}, {}
+    if kind == "sms":
+        headers = {"Authorization": f"Bearer {SMS_TOKEN}"} if SMS_TOKEN else {}
+        return SMS_URL, {"to": target, "text": BATCH_SEP.join(texts)}, headers
+    return target, {"sink": name, "messages": texts}, {}
+
+
+def _post(url, body, headers):
+    """Blocking JSON POST; run in a worker thread, never on the loop"""
+    req = urllib.request.Request(
+        url, data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json", **headers}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=NOTIFY_TIMEOUT) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        retry_after = e.headers.get("Retry-After", "")
+        raise DeliveryError(
+            f"HTTP {e.code}",
+            permanent=400 <= e.code < 500 and e.code not in (408, 429),
+            retry_after=float(retry_after) if retry_after.isdigit() else None,
+        ) from e
+    except (urllib.error.URLError, OSError) as e:
+        raise DeliveryError(str(e)) from e
+
+
+# ==================================================
+# EVENT LOOP
+# ==================================================
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    """The shared asyncio loop, started on a daemon thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="notify-loop", daemon=True).start()
+        return _loop
+
+
+# ==================================================
+# SINK WORKER
+# ==================================================
+
+class SinkWorker:
+    """A virtual printer that delivers jobs as messages
+
+    Has the same name/state/queue/submit surface as PrinterWorker, so
+    routing, drain() and the header badges treat it like any printer.
+    submit() only enqueues and wakes the loop: a slow or failing API
+    never holds up the request that printed.
+    """
+
+    def __init__(self, name, kind, target):
+        self.name = name
+        self.kind = kind
+        self.target = target
+        self.queue = queue.Queue()
+        self.state = "ok"
+        self.wake = None
+        self._carry = None
+        self.loop = _event_loop()
+        asyncio.run_coroutine_threadsafe(self._run(), self.loop)
+
+    def submit(self, job):
+        text = job_text(job)
+        if text:
+            self.send(text)
+
+    def send(self, text):
+        """Queue one message text (thread-safe, returns immediately)"""
+        self.queue.put(text[:MAX_CHARS[self.kind]])
+        metrics.set_gauge("print_queue_depth", self.queue.qsize(), printer=self.name)
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if self.wake:
+            self.wake.set()
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        logger.info(f"Sink {self.name}: {self.state} -> {state}")
+        self.state = state
+        publish("printer", name=self.name, state=state, queued=self.queue.qsize())
+
+    def _take_batch(self):
+        """Pull queued texts while they fit in one delivery"""
+        batch, size = [], 0
+        while len(batch) < BATCH_MAX:
+            if self._carry is not None:
+                text, self._carry = self._carry, None
+            else:
+                try:
+                    text = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch and size + len(BATCH_SEP) + len(text) > MAX_CHARS[self.kind]:
+                self._carry = text
+                break
+            batch.append(text)
+            size += len(BATCH_SEP) + len(text)
+        return batch
+
+    async def _run(self):
+        self.wake = asyncio.Event()
+        interval = 1 / NOTIFY_RATE if NOTIFY_RATE > 0 else 0
+        while True:
+            if self._carry is None and self.queue.empty():
+                self.wake.clear()
+                await self.wake.wait()
+                # Give messages printed together a moment to join one batch
+                await asyncio.sleep(NOTIFY_BATCH_SECS)
+
+            batch = self._take_batch()
+            started = time.monotonic()
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                logger.error(f"Sink {self.name} failed: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+                metrics.set_gauge("print_queue_depth", self.queue.qsize(), printer=self.name)
+            # Rate limit: at most NOTIFY_RATE deliveries per second
+            await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+    async def _deliver(self, batch):
+        url, body, headers = _request(self.name, self.kind, self.target, batch)
+        error, attempt = None, 0
+        for attempt in range(1, NOTIFY_RETRIES + 1):
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(_post, url, body, headers)
+                metrics.inc("notify_batches", sink=self.name)
+                metrics.inc("notify_messages", len(batch), sink=self.name)
+                self._set_state("ok")
+                return
+            except Exception as e:
+                # Anything but a transport failure is a misconfigured sink
+                # (empty SMS URL, bad webhook target): retrying can't help
+                error = e
+                if not isinstance(e, DeliveryError):
+                    error = DeliveryError(f"{type(e).__name__}: {e}", permanent=True)
+                logger.warning(f"Sink {self.name}: attempt {attempt} failed: {error}")
+                if error.permanent or attempt == NOTIFY_RETRIES:
+                    break
+                metrics.inc("notify_retries", sink=self.name)
+                self._set_state("retrying")
+                delay = error.retry_after
+                if delay is None:
+                    delay = min(BACKOFF_MAX, 2 ** attempt) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+            finally:
+                metrics.inc("notify_seconds", round(time.monotonic() - started, 3), sink=self.name)
+
+        metrics.inc("notify_dead_letters", sink=self.name)
+        self._set_state("failed")
+        await asyncio.to_thread(dead_letter, self.name, batch, str(error), attempt)
+
+
+# ==================================================
+# DEAD LETTERS
+# ==================================================
+
+def dead_letter(sink, messages, error, attempts):
+    """Record a batch that could not be delivered"""
+    db = connect()
+    try:
+        with db:
+            db.execute(
+                "INSERT INTO notify_dead_letters (sink, messages, error, attempts, failed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sink, json.dumps(messages), error, attempts, now_iso())
+            )
+    finally:
+        db.close()
+    logger.error(f"Sink {sink}: gave up after {attempts} attempts ({error}), {len(messages)} messages dead-lettered")
+
+
+def dead_letters(db):
+    return db.execute("SELECT * FROM notify_dead_letters ORDER BY id").fetchall()
+
+
+def retry_dead_letters(db):
+    """Queue every dead-lettered batch again on its sink; returns messages requeued"""
+    from modules.print import get_worker
+
+    count = 0
+    for row in dead_letters(db):
+        worker = get_worker(row["sink"])
+        if not isinstance(worker, SinkWorker):
+            continue
+        for text in json.loads(row["messages"]):
+            worker.send(text)
+            count += 1
+        with db:
+            db.execute("DELETE FROM notify_dead_letters WHERE id=?", (row["id"],))
+    return count
@@ -1,9 +1,23 @@
 """
-Printer module for BIXOLON SRP-E300 thermal printer
-Handles all printing operations and Windows printer integration
+Printer module for BIXOLON SRP-E300 thermal printers
+Handles rendering print jobs and routing them to one or more printers,
+each with its own queue and worker so a slow printer never blocks the rest
 """
 import os
+import json
+import time
+import queue
+import socket
 import logging
+import textwrap
+import threading
+from datetime import date
+from functools import lru_cache
+from itertools import groupby
+from modules import metrics
+from modules.db import connect, now_iso
+from modules.live import publish
+from modules.notify import SINK_KINDS, SinkWorker
 
 # ==================================================
 # CONFIG
@@ -13,68 +27,463 @@ LINE_WIDTH = int(os.getenv("TICKETS_PRINT_COLS", "32"))
 PRINTER_NAME = os.getenv("TICKETS_PRINTER_NAME", "BIXOLON SRP-E300")
 DEBUG_PRINT = os.getenv("DEBUG_PRINT", "false").strip().lower() == "true"
 
+# name=kind:target pairs, e.g. "desk=win32:BIXOLON SRP-E300;workshop=network:10.0.0.9:9100"
+# kinds telegram/sms/webhook are notification sinks (modules/notify.py)
+PRINTERS = os.getenv("TICKETS_PRINTERS", f"default=win32:{PRINTER_NAME}")
+# rule=printer pairs checked in order, e.g. "tag:workshop=workshop,priority:1=desk"
+PRINTER_ROUTES = os.getenv("TICKETS_PRINTER_ROUTES", "")
+DEFAULT_PRINTER = os.getenv("TICKETS_DEFAULT_PRINTER", "")
+STATUS_POLL_SECS = float(os.getenv("TICKETS_PRINTER_POLL", "5"))  # 0 disables
+PRINT_RETRIES = int(os.getenv("TICKETS_PRINT_RETRIES", "3"))  # writes per job before dead-lettering
+BACKOFF_MAX = 60
+# QR code on each ticket that /scan/<id> closes; the base URL lets a phone camera open it
+PRINT_QR = os.getenv("TICKETS_PRINT_QR", "false").strip().lower() == "true"
+SCAN_URL = os.getenv("TICKETS_SCAN_URL", "").rstrip("/")
+QR_BOX = 4  # printer dots per QR module
+# Week sheet layout: full (a ticket block per task) or compact (a line per task under day headings)
+WEEK_LAYOUT = os.getenv("TICKETS_WEEK_LAYOUT", "full").strip().lower()
+WEEK_LAYOUTS = ("full", "compact")
+STATUS_TIMEOUT = 2
+
+# ESC/POS real-time status requests: DLE EOT 1 (printer), 2 (offline cause), 4 (paper)
+STATUS_QUERY = b"\x10\x04\x01\x10\x04\x02\x10\x04\x04"
+AVAILABLE_STATES = ("ok", "unknown")
+
 logger = logging.getLogger(__name__)
 
+
 # ==================================================
-# PRINTER SETUP (WINDOWS / BIXOLON)
+# PRINT JOBS
 # ==================================================
-printer = None  # <-- MUST exist unconditionally
 
-if not NO_PRINTER:
-    try:
+class Job:
+    """A list of printer operations, written out in one go by a worker"""
+
+    def __init__(self, layout=None):
+        self.ops = []
+        self.layout = layout  # set for week sheets, to compare layouts in /metrics
+
+    def line(self, text=""):
+        self.ops.append(("text", text))
+
+    def heading(self, text):
+        """A double-height bold line"""
+        self.ops.append(("heading", text))
+
+    def cut(self):
+        self.ops.append(("cut", None))
+
+    def qr(self, payload):
+        self.ops.append(("qr", payload))
+
+    @property
+    def line_count(self):
+        return sum(1 for op, _ in self.ops if op in ("text", "heading"))
+
+
+def scan_payload(ticket_id):
+    """What a ticket's QR code encodes: the scan URL, or just the ID"""
+    return f"{SCAN_URL}/scan/{ticket_id}" if SCAN_URL else str(ticket_id)
+
+
+@lru_cache(maxsize=1024)
+def qr_raster(payload):
+    """Centered ESC/POS raster (GS v 0) of a QR code, built once per payload
+
+    Reprints and week sheets reuse the bytes instead of redrawing the image.
+    """
+    import qrcode
+    from PIL import Image
+
+    code = qrcode.QRCode(box_size=QR_BOX, border=1)
+    code.add_data(payload)
+    img = code.make_image().get_image().convert("1")
+
+    # Rows are whole bytes; pad with white, then flip so 1 = black dot
+    width = (img.width + 7) // 8 * 8
+    canvas = Image.new("1", (width, img.height), 1)
+    canvas.paste(img, (0, 0))
+    bits = bytes(b ^ 0xFF for b in canvas.tobytes())
+
+    header = b"\x1dv0\x00" + (width // 8).to_bytes(2, "little") + img.height.to_bytes(2, "little")
+    return b"\x1ba\x01" + header + bits + b"\x1ba\x00"
+
+
+def _open_device(kind, target):
+    """Create the python-escpos device for a printer spec (imported lazily)"""
+    if kind == "win32":
         from escpos.printer import Win32Raw
-        printer = Win32Raw(PRINTER_NAME)
-        logger.info(f"Printer initialised: {PRINTER_NAME}")
-    except Exception as e:
-        logger.error(f"Printer init failed: {e}")
-        printer = None
-else:
-    logger.info("NO_PRINTER enabled → console output only")
+        return Win32Raw(target)
+    if kind == "network":
+        from escpos.printer import Network
+        host, _, port = target.partition(":")
+        return Network(host, port=int(port or 9100))
+    raise ValueError(f"Unknown printer kind '{kind}'")
+
+
+def query_status(host, port, timeout=STATUS_TIMEOUT):
+    """Ask a network printer for its real-time status
+
+    Uses its own short-lived connection, so it never interleaves with a
+    print job. Returns ok, paper_out, cover_open or offline.
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as s:
+            s.sendall(STATUS_QUERY)
+            data = b""
+            while len(data) < 3:
+                chunk = s.recv(3 - len(data))
+                if not chunk:
+                    break
+                data += chunk
+    except OSError:
+        return "offline"
+
+    if len(data) < 3:
+        return "offline"
+    printer, cause, paper = data
+    if cause & 0x04:
+        return "cover_open"
+    if paper & 0x60 or cause & 0x20:
+        return "paper_out"
+    if printer & 0x08:
+        return "offline"
+    return "ok"
+
+
+class PrinterWorker:
+    """One printer, one queue, one thread (plus a status poller for network printers)
+
+    While the poller reports the printer unavailable, jobs stay queued and
+    the worker waits; they resume on their own once it is back. A failed
+    write is repeated only while the printer itself is the problem (status
+    offline/paper out, or no status channel), at most PRINT_RETRIES times;
+    after that the job goes to print_dead_letters and the queue moves on.
+    """
+
+    def __init__(self, name, kind, target):
+        self.name = name
+        self.kind = "console" if NO_PRINTER else kind
+        self.target = target
+        self.device = None
+        self.queue = queue.Queue()
+        self.state = "ok" if self.kind == "console" else "unknown"
+        self.available = threading.Event()
+        self.available.set()
+        self.polled = self.kind == "network" and STATUS_POLL_SECS > 0
+        self.holding = None   # job waiting for the printer to come back
+        self.shelved = False
+        self.thread = threading.Thread(target=self._run, name=f"printer-{name}", daemon=True)
+        self.thread.start()
+        if self.polled:
+            threading.Thread(target=self._poll, name=f"printer-status-{name}", daemon=True).start()
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        logger.info(f"Printer {self.name}: {self.state} -> {state}")
+        self.state = state
+        up = state in AVAILABLE_STATES
+        if up:
+            self.available.set()
+        else:
+            self.available.clear()
+        metrics.set_gauge("printer_up", int(up), printer=self.name)
+        metrics.inc("printer_state_changes", printer=self.name)
+        publish("printer", name=self.name, state=state, queued=self.queue.qsize())
+
+    def _poll(self):
+        host, _, port = self.target.partition(":")
+        while True:
+            self._set_state(query_status(host, int(port or 9100)))
+            time.sleep(STATUS_POLL_SECS)
+
+    def submit(self, job):
+        self.queue.put(job)
+        metrics.set_gauge("print_queue_depth", self.queue.qsize(), printer=self.name)
+
+    def _device(self):
+        if self.device is None:
+            self.device = _open_device(self.kind, self.target)
+            logger.info(f"Printer initialised: {self.name} ({self.kind}:{self.target})")
+        return self.device
+
+    def _drop_device(self):
+        """Close a device that failed mid-job so its socket or spool handle isn't leaked"""
+        dev, self.device = self.device, None
+        if dev is not None and hasattr(dev, "close"):
+            try:
+                dev.close()
+            except Exception:
+                pass
+
+    def _write_console(self, job):
+        for op, arg in job.ops:
+            if op in ("text", "heading"):
+                print(arg)
+            elif op == "qr":
+                print(f"[QR {arg}]".center(LINE_WIDTH))
+            elif op == "cut":
+                print("-" * LINE_WIDTH)
+
+    def _write(self, job):
+        if self.kind == "console":
+            self._write_console(job)
+            return
+
+        dev = self._device()
+        for op, arg in job.ops:
+            if op == "text":
+                dev.text(arg + "\n")
+            elif op == "heading":
+                dev.set(bold=True, double_height=True)
+                dev.text(arg + "\n")
+                dev.set(bold=False, normal_textsize=True)
+            elif op == "qr":
+                dev._raw(qr_raster(arg))
+                dev.text("\n")
+            elif op == "cut":
+                dev.cut()
+        # Closing hands the job to the spooler / flushes the socket
+        if hasattr(dev, "close"):
+            dev.close()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._print(job)
+            finally:
+                metrics.set_gauge("print_queue_depth", self.queue.qsize(), printer=self.name)
+                self.queue.task_done()
+
+    def _print(self, job):
+        error, attempt = None, 0
+        for attempt in range(1, PRINT_RETRIES + 1):
+            if self.polled:
+                # Hold the job until the poller says the printer is usable
+                self.holding = job
+                self.available.wait()
+                self.holding = None
+                if self.shelved:
+                    # shelve() already dead-lettered this job
+                    self.shelved = False
+                    return
+            started = time.monotonic()
+            try:
+                if DEBUG_PRINT:
+                    logger.debug(f"{self.name}: writing {len(job.ops)} ops")
+                self._write(job)
+                metrics.inc("print_jobs", printer=self.name)
+                metrics.inc("print_lines", job.line_count, printer=self.name)
+                if job.layout:
+                    metrics.inc("week_sheets", layout=job.layout)
+                    metrics.inc("week_sheet_lines", job.line_count, layout=job.layout)
+                    metrics.inc("week_sheet_seconds", round(time.monotonic() - started, 3), layout=job.layout)
+                if not self.polled:
+                    self._set_state("ok")
+                return
+            except Exception as e:
+                error = e
+                logger.error(f"Print failed on {self.name} (attempt {attempt}): {e}")
+                metrics.inc("print_errors", printer=self.name)
+                self._drop_device()
+            finally:
+                metrics.inc("print_seconds", round(time.monotonic() - started, 3), printer=self.name)
+            if attempt == PRINT_RETRIES or not self._should_retry(attempt):
+                break
+            metrics.inc("print_retries", printer=self.name)
+
+        if not self.polled:
+            self._set_state("failed")
+        metrics.inc("print_dead_letters", printer=self.name)
+        dead_letter(self.name, job, str(error), attempt)
+
+    def shelve(self):
+        """Dead-letter every job still waiting here; returns how many
+
+        For a process about to exit (the CLI after drain() times out):
+        its worker threads die with it, so held jobs would be lost.
+        """
+        self.shelved = True
+        held = self.holding
+        jobs = [held] if held else []
+        while True:
+            try:
+                jobs.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            self.queue.task_done()
+        for job in jobs:
+            dead_letter(self.name, job, f"held while printer {self.state}", 0)
+        if held:
+            # Release the held job so its task is marked done; the poller
+            # clears the event again on its next round
+            self.available.set()
+        else:
+            self.shelved = False
+        return len(jobs)
+
+    def _should_retry(self, attempt):
+        """Whether a failed write is worth repeating
+
+        Network printers are asked directly: only offline, paper out or
+        cover open mean the printer is at fault. If it reports ok, the job
+        itself is broken and sending it again would only print it twice.
+        Without a status channel, wait with backoff and try again.
+        """
+        if self.polled:
+            host, _, port = self.target.partition(":")
+            state = query_status(host, int(port or 9100))
+            self._set_state(state)
+            return state not in AVAILABLE_STATES
+        self._set_state("retrying")
+        time.sleep(min(BACKOFF_MAX, 2 ** attempt))
+        return True
+
 
 # ==================================================
-# PRINT HELPERS
+# DEAD LETTERS
 # ==================================================
 
-def print_line(text=""):
-    """Print a line of text to printer or console"""
-    if DEBUG_PRINT:
-        logger.debug(f"NO_PRINTER={NO_PRINTER}, printer={printer}")
-    
-    if NO_PRINTER or printer is None:
-        print(text)
-    else:
-        try:
-            printer.text(text + "\n")
-        except Exception as e:
-            logger.error(f"Print failed: {e}")
-            print(text)
+def dead_letter(printer, job, error, attempts):
+    """Record a job that could not be printed"""
+    db = connect()
+    try:
+        with db:
+            db.execute(
+                "INSERT INTO print_dead_letters (printer, ops, layout, error, attempts, failed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (printer, json.dumps(job.ops), job.layout, error, attempts, now_iso())
+            )
+    finally:
+        db.close()
+    logger.error(f"Printer {printer}: gave up after {attempts} attempts ({error}), job dead-lettered")
 
 
-def print_cut():
-    """Cut the paper (or print dashes in console mode)"""
-    if NO_PRINTER or printer is None:
-        print("-" * LINE_WIDTH)
-    else:
-        try:
-            printer.cut()
-        except Exception as e:
-            logger.error(f"Cut failed: {e}")
+def dead_letters(db):
+    return db.execute("SELECT * FROM print_dead_letters ORDER BY id").fetchall()
 
 
-def print_ticket(t):
-    """Print a formatted ticket"""
+def retry_dead_letters(db):
+    """Queue every dead-lettered job again on its printer; returns jobs requeued"""
+    count = 0
+    for row in dead_letters(db):
+        job = Job(row["layout"])
+        job.ops = [tuple(op) for op in json.loads(row["ops"])]
+        submit(job, row["printer"])
+        count += 1
+        with db:
+            db.execute("DELETE FROM print_dead_letters WHERE id=?", (row["id"],))
+    return count
+
+
+# ==================================================
+# REGISTRY & ROUTING
+# ==================================================
+
+def _parse_printers(spec):
+    printers = {}
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        name, _, device = entry.partition("=")
+        kind, _, target = device.partition(":")
+        printers[name.strip()] = (kind.strip() or "console", target.strip())
+    return printers
+
+
+def _parse_routes(spec):
+    routes = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        rule, _, name = entry.partition("=")
+        field, _, value = rule.partition(":")
+        routes.append((field.strip(), value.strip().lower(), name.strip()))
+    return routes
+
+
+_registry = _parse_printers(PRINTERS)
+_routes = _parse_routes(PRINTER_ROUTES)
+_default = DEFAULT_PRINTER or next(iter(_registry), "default")
+_workers = {}
+_workers_lock = threading.Lock()
+
+if NO_PRINTER:
+    logger.info("NO_PRINTER enabled → console output only")
+
+
+def printer_names():
+    """Return configured printer names"""
+    return list(_registry) or [_default]
+
+
+def printer_status():
+    """Last known state and queue length for every configured printer"""
+    return [
+        {"name": w.name, "state": w.state, "queued": w.queue.qsize()}
+        for w in (get_worker(name) for name in printer_names())
+    ]
+
+
+def get_worker(name=None):
+    """Return (starting if needed) the worker for a printer name"""
+    name = name if name in _registry else _default
+    with _workers_lock:
+        if name not in _workers:
+            kind, target = _registry.get(name, ("console", ""))
+            worker = SinkWorker if kind in SINK_KINDS else PrinterWorker
+            _workers[name] = worker(name, kind, target)
+        return _workers[name]
+
+
+def route(t):
+    """Pick the printer for a ticket: first matching tag/priority rule, else default"""
+    tags = (t["tags"] or "").split(",")
+    for field, value, name in _routes:
+        if field == "tag" and value in tags:
+            return name
+        if field == "priority" and value == str(t["priority"]):
+            return name
+    return _default
+
+
+def submit(job, printer=None):
+    """Queue a job on a printer (default printer if none given)"""
+    get_worker(printer).submit(job)
+
+
+def drain(timeout=None):
+    """Block until every queued job has been written (used by the CLI)
+
+    An offline printer holds its jobs indefinitely, so callers that must
+    finish pass a timeout. Returns the workers still holding jobs when it
+    runs out (empty if everything was written).
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _workers_lock:
+        workers = list(_workers.values())
+    for w in workers:
+        while w.queue.unfinished_tasks and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.05)
+    return [w for w in workers if w.queue.unfinished_tasks]
+
+
+# ==================================================
+# RENDERING
+# ==================================================
+
+def render_ticket(job, t, qr=PRINT_QR):
+    """Append a formatted ticket to a job, with a scannable QR code if qr is set"""
     sep = "*" * (LINE_WIDTH - 4)
 
     def center(s):
         return s.center(LINE_WIDTH - 4)
 
-    print_line(sep)
+    job.line(sep)
 
     header = f"P{t['priority']}"
     if t["tags"]:
         header += f" [{t['tags'].upper()}]"
-    print_line(center(header))
-    print_line("")
+    job.line(center(header))
+    job.line("")
 
     title = t["title"].upper()
     words = title.split()
@@ -84,30 +493,119 @@ def print_ticket(t):
         if len(line) + len(w) + 1 <= LINE_WIDTH:
             line = f"{line} {w}".strip()
         else:
-            print_line(center(line))
+            job.line(center(line))
             line = w
     if line:
-        print_line(center(line))
+        job.line(center(line))
 
-    print_line("")
+    job.line("")
 
     if t["due_at"]:
-        print_line(center(f"DUE {t['due_at'][:10]}"))
+        job.line(center(f"DUE {t['due_at'][:10]}"))
 
-    print_line(sep)
-    print_line("")
+    if qr and t["id"]:
+        job.qr(scan_payload(t["id"]))
 
+    job.line(sep)
+    job.line("")
 
-def print_flush():
-    """Force Windows spooler to flush print buffer by closing connection"""
-    global printer
-    if NO_PRINTER or printer is None:
-        return
-    try:
-        if hasattr(printer, "close"):
-            printer.close()
-            logger.info("Printer closed - job sent to spooler")
+
+def render_week(job, week_start, week_end, tasks, qr=PRINT_QR):
+    """Append a week header, every task and a footer to a job"""
+    job.line("=" * 46)
+    job.line(f"WEEK {week_start.strftime('%b %d')} - {week_end.strftime('%b %d')}".center(46))
+    job.line("=" * 46)
+    job.line("")
+
+    if tasks:
+        for t in tasks:
+            render_ticket(job, t, qr)
+    else:
+        job.line("No tasks this week".center(46))
+        job.line("")
+
+    job.line("=" * 46)
+
+
+def _compact_lines(t):
+    """Sheet lines for one task: checkbox, priority, time, title and #tags
+
+    Usually one line. A long title wraps onto indented continuation lines
+    instead of being cut, so tasks with similar names stay distinct; tags go
+    after it while whole tags fit, and the rest are left off.
+    """
+    clock = t["due_at"][11:16]
+    head = f"[ ] P{t['priority']} " + (f"{clock} " if clock else "")
+    room = LINE_WIDTH - len(head)
+    lines = textwrap.wrap(t["title"], room) or [""]
+    for tag in filter(None, (t["tags"] or "").split(",")):
+        candidate = f"{lines[-1]} #{tag}".lstrip()
+        if len(candidate) <= room:
+            lines[-1] = candidate
+    indent = " " * len(head)
+    return [head + lines[0]] + [indent + line for line in lines[1:]]
+
+
+def render_week_compact(job, week_start, week_end, tasks):
+    """Append a compact week sheet: a heading per day, one line per task
+
+    tasks must be ordered by due_at (as dated_tasks returns them), so the
+    day groups come straight off the list without another query.
+    """
+    job.heading(f"WEEK {week_start.strftime('%b %d')} - {week_end.strftime('%b %d')}")
+    for day, day_tasks in groupby(tasks, key=lambda t: t["due_at"][:10]):
+        job.heading(date.fromisoformat(day).strftime("%a %d %b").upper())
+        for t in day_tasks:
+            for line in _compact_lines(t):
+                job.line(line)
+    if not tasks:
+        job.line("No tasks this week")
+    job.line("-" * LINE_WIDTH)
+    job.line(f"{len(tasks)} tasks")
+
+
+# ==================================================
+# PRINT HELPERS
+# ==================================================
+
+def print_lines(lines, printer=None):
+    """Print plain lines followed by a cut"""
+    job = Job()
+    for text in lines:
+        job.line(text)
+    job.cut()
+    submit(job, printer)
+
+
+def print_ticket(t, printer=None, qr=PRINT_QR):
+    """Print one ticket on its routed (or the given) printer"""
+    job = Job()
+    render_ticket(job, t, qr)
+    job.cut()
+    submit(job, printer or route(t))
+
+
+def print_week(week_start, week_end, tasks, printer=None, qr=PRINT_QR, layout=WEEK_LAYOUT):
+    """Print the week sheet, fanned out so each printer gets its own tickets
+
+    Every routed printer gets its own sheet on its own queue, so printers
+    work in parallel. An explicit printer gets the whole week. Returns the
+    number of lines queued.
+    """
+    by_printer = {}
+    for t in tasks:
+        by_printer.setdefault(printer or route(t), []).append(t)
+    if not by_printer:
+        by_printer[printer or _default] = []
+
+    lines = 0
+    for name, printer_tasks in by_printer.items():
+        job = Job(layout)
+        if layout == "compact":
+            render_week_compact(job, week_start, week_end, printer_tasks)
         else:
-            logger.debug("Printer has no close method")
-    except Exception as e:
-        logger.warning(f"Printer close failed: {e}")
+            render_week(job, week_start, week_end, printer_tasks, qr)
+        job.cut()
+        lines += job.line_count
+        submit(job, name)
+    return lines
@@ -0,0 +1,237 @@
+"""
+Recurrence module for ticket system
+Expands recurring rule tickets into occurrences for the range being viewed
+"""
+import logging
+from datetime import date, time, timedelta
+from functools import lru_cache
+from modules.db import insert_ticket
+from modules.clock import on_day_change
+
+# ==================================================
+# CONFIG
+# ==================================================
+RULES = {
+    "daily": (0, 1, 2, 3, 4, 5, 6),
+    "weekdays": (0, 1, 2, 3, 4),
+    "mon": (0,),
+    "tue": (1,),
+    "wed": (2,),
+    "thu": (3,),
+    "fri": (4,),
+    "sat": (5,),
+    "sun": (6,),
+}
+
+DEFAULT_TIME = "09:00"
+OCCURRENCE_SEP = ":"
+
+logger = logging.getLogger(__name__)
+
+
+# ==================================================
+# EXPANSION
+# ==================================================
+
+@lru_cache(maxsize=1024)
+def occurrence_dates(recurrence, rule_start, range_start, range_end):
+    """Return ISO dates a rule falls on within [range_start, range_end]
+
+    Cached per (rule, range) so repeated views of the same week or month
+    never re-walk the calendar. Only the requested range is generated,
+    which keeps rules that run forever cheap.
+    """
+    weekdays = RULES.get(recurrence)
+    if not weekdays:
+        return ()
+
+    d = max(date.fromisoformat(range_start), date.fromisoformat(rule_start))
+    end = date.fromisoformat(range_end)
+    dates = []
+    while d <= end:
+        if d.weekday() in weekdays:
+            dates.append(d.isoformat())
+        d += timedelta(days=1)
+    return tuple(dates)
+
+
+@on_day_change
+def _forget_old_ranges(previous, current):
+    """Ranges from before today will not be asked for again"""
+    occurrence_dates.cache_clear()
+
+
+def occurrence_id(rule_id, occ_date):
+    """Build the virtual ticket ID for one occurrence of a rule"""
+    return f"{rule_id}{OCCURRENCE_SEP}{occ_date}"
+
+
+def parse_occurrence_id(ticket_id):
+    """Split a virtual occurrence ID into (rule_id, date), or None"""
+    rule_id, sep, occ_date = ticket_id.rpartition(OCCURRENCE_SEP)
+    if not sep or not rule_id:
+        return None
+    try:
+        date.fromisoformat(occ_date)
+    except ValueError:
+        return None
+    return rule_id, occ_date
+
+
+def _occurrence(rule, occ_date):
+    """Build a ticket-shaped dict for one occurrence of a rule"""
+    t = {k: rule[k] for k in rule.keys()}
+    t.update(
+        id=occurrence_id(rule["id"], occ_date),
+        due_at=f"{occ_date}T{rule['recurrence_time'] or DEFAULT_TIME}",
+        recurrence_id=rule["id"],
+        occurrence_date=occ_date,
+    )
+    return t
+
+
+def valid_time(value):
+    """True for an HH:MM time of day"""
+    try:
+        time.fromisoformat(value)
+    except ValueError:
+        return False
+    return len(value) == 5
+
+
+def _rule_start(rule):
+    """ISO start date of a rule, or None if the stored value isn't a date"""
+    start = rule["recurrence_start"] or rule["created_at"][:10]
+    try:
+        date.fromisoformat(start)
+    except ValueError:
+        logger.warning(f"Skipping rule {rule['id']}: bad start date '{start}'")
+        return None
+    return start
+
+
+def expand(db, range_start, range_end, tag=None):
+    """Return virtual occurrences of open rules within a date range
+
+    Dates that already have a materialized ticket (closed or edited)
+    are skipped; those show up through the normal ticket queries.
+    """
+    rules = db.execute(
+        """
+        SELECT * FROM tickets
+        WHERE status = 'open'
+          AND COALESCE(recurrence, 'none') != 'none'
+        """
+    ).fetchall()
+    if not rules:
+        return []
+
+    materialized = {
+        (r["recurrence_id"], r["occurrence_date"])
+        for r in db.execute(
+            """
+            SELECT recurrence_id, occurrence_date FROM tickets
+            WHERE recurrence_id IS NOT NULL
+              AND occurrence_date BETWEEN ? AND ?
+            UNION ALL
+            SELECT recurrence_id, occurrence_date FROM tickets_archive
+            WHERE recurrence_id IS NOT NULL
+              AND occurrence_date BETWEEN ? AND ?
+            """,
+            (range_start, range_end, range_start, range_end)
+        )
+    }
+
+    occurrences = []
+    for rule in rules:
+        if tag and tag not in (rule["tags"] or "").split(","):
+            continue
+        start = _rule_start(rule)
+        if start is None:
+            continue
+        for occ_date in occurrence_dates(rule["recurrence"], start, range_start, range_end):
+            if (rule["id"], occ_date) not in materialized:
+                occurrences.append(_occurrence(rule, occ_date))
+    return occurrences
+
+
+def dated_tasks(db, range_start, range_end, tag=None):
+    """Open dated tickets plus recurring occurrences, ordered by due date"""
+    rows = db.execute(
+        """
+        SELECT * FROM tickets
+        WHERE status = 'open'
+          AND due_at IS NOT NULL
+          AND date(due_at) BETWEEN date(?) AND date(?)
+          AND COALESCE(recurrence, 'none') = 'none'
+        ORDER BY due_at, priority DESC
+        """,
+        (range_start, range_end)
+    ).fetchall()
+    if tag:
+        rows = [t for t in rows if tag in (t["tags"] or "").split(",")]
+
+    occurrences = expand(db, range_start, range_end, tag)
+    return sorted([*rows, *occurrences], key=lambda t: (t["due_at"], -t["priority"]))
+
+
+# ==================================================
+# MATERIALIZATION
+# ==================================================
+
+def get_occurrence(db, ticket_id):
+    """Return the virtual occurrence for an ID, or None if it isn't one"""
+    parsed = parse_occurrence_id(ticket_id)
+    if not parsed:
+        return None
+    rule_id, occ_date = parsed
+    rule = db.execute(
+        "SELECT * FROM tickets WHERE id=? AND COALESCE(recurrence, 'none') != 'none'",
+        (rule_id,)
+    ).fetchone()
+    if not rule:
+        return None
+    return _occurrence(rule, occ_date)
+
+
+def materialized(db, ticket_id):
+    """Return the real row an occurrence ID was turned into, or None
+
+    Looks in the archive too, where a closed occurrence ends up.
+    """
+    parsed = parse_occurrence_id(ticket_id)
+    if not parsed:
+        return None
+    for table in ("tickets", "tickets_archive"):
+        row = db.execute(
+            f"SELECT * FROM {table} WHERE recurrence_id=? AND occurrence_date=?",
+            parsed
+        ).fetchone()
+        if row:
+            return row
+    return None
+
+
+def materialize(db, ticket_id):
+    """Turn a virtual occurrence into a real ticket row
+
+    Returns the new ticket ID, the existing row's ID if the occurrence
+    was already materialized (it may have been archived since), or None
+    if the ID is not an occurrence.
+    """
+    occ = get_occurrence(db, ticket_id)
+    if not occ:
+        return None
+
+    existing = materialized(db, ticket_id)
+    if existing:
+        return existing["id"]
+
+    new_id = insert_ticket(
+        db, occ["title"], occ["priority"], occ["due_at"], occ["tags"], occ["notes"]
+    )
+    db.execute(
+        "UPDATE tickets SET recurrence_id=?, occurrence_date=? WHERE id=?",
+        (occ["recurrence_id"], occ["occurrence_date"], new_id)
+    )
+    return new_id
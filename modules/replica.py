@@ -0,0 +1,153 @@
+"""
+Read replica client for the ticket system
+Keeps a local SQLite copy current by pulling /api/changes deltas from the primary.
+Point TICKETS_DB at the replica file to serve read-only views from it.
+
+    python -m modules.replica --url http://primary:5000 --db replica.db --interval 10
+
+Set TICKETS_TOKEN to a token with the sync scope (python cli.py token --scopes sync)
+to avoid sending the password.
+"""
+import os
+import json
+import time
+import base64
+import logging
+import argparse
+import urllib.parse
+import urllib.request
+from dotenv import load_dotenv
+from modules.db import connect, rebuild_stats
+
+logger = logging.getLogger(__name__)
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS replica_state (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+"""
+
+
+class Replica:
+    """A local database that follows a primary through its change log"""
+
+    def __init__(self, url, db_path, user=None, password=None, batch=500, token=None):
+        self.url = url.rstrip("/")
+        self.db = connect(db_path)
+        self.db.executescript(STATE_SCHEMA)
+        self.batch = batch
+        if token:
+            self.auth = f"Bearer {token}"
+        else:
+            creds = f"{user or ''}:{password or ''}".encode()
+            self.auth = "Basic " + base64.b64encode(creds).decode()
+
+    @property
+    def cursor(self):
+        row = self.db.execute("SELECT value FROM replica_state WHERE key='cursor'").fetchone()
+        return int(row[0]) if row else 0
+
+    @property
+    def resume(self):
+        """Where an unfinished snapshot left off, or None"""
+        row = self.db.execute("SELECT value FROM replica_state WHERE key='resume'").fetchone()
+        return row[0] if row else None
+
+    def _fetch(self, since, resume=None):
+        query = {"since": since, "limit": self.batch}
+        if resume:
+            query["resume"] = resume
+        req = urllib.request.Request(
+            f"{self.url}/api/changes?{urllib.parse.urlencode(query)}",
+            headers={"Authorization": self.auth, "Accept": "application/json"}
+        )
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return json.load(resp)
+
+    def _apply(self, payload, resumed=False):
+        """Apply one batch and advance the cursor in the same transaction
+
+        A snapshot arrives in pages: the first clears the local tables, and
+        the cursor only moves once the last page is in.
+        """
+        snapshot = payload.get("snapshot")
+        with self.db:
+            if snapshot and not resumed:
+                for table in ("tickets", "tickets_archive"):
+                    self.db.execute(f"DELETE FROM {table}")
+            for change in payload["changes"]:
+                table = change["table"]
+                if table not in ("tickets", "tickets_archive"):
+                    continue
+                if change["op"] == "delete":
+                    self.db.execute(f"DELETE FROM {table} WHERE id=?", (change["id"],))
+                    continue
+                row = change["row"]
+                local = {r[1] for r in self.db.execute(f"PRAGMA table_info({table})")}
+                cols = [c for c in row if c in local]
+                # An upsert fires the update triggers, so the local stats stay right
+                self.db.execute(
+                    f"INSERT INTO {table} ({', '.join(cols)}) "
+                    f"VALUES ({', '.join('?' * len(cols))}) "
+                    f"ON CONFLICT(id) DO UPDATE SET "
+                    + ", ".join(f"{c}=excluded.{c}" for c in cols if c != "id"),
+                    [row[c] for c in cols]
+                )
+            # The local triggers log our own writes; nobody reads them here
+            self.db.execute("DELETE FROM changes")
+            if snapshot and payload["more"]:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO replica_state (key, value) VALUES ('resume', ?)",
+                    (payload["resume"],)
+                )
+                return
+            if snapshot:
+                rebuild_stats(self.db)
+            self.db.execute("DELETE FROM replica_state WHERE key='resume'")
+            self.db.execute(
+                "INSERT OR REPLACE INTO replica_state (key, value) VALUES ('cursor', ?)",
+                (str(payload["cursor"]),)
+            )
+
+    def sync(self):
+        """Pull and apply batches until caught up; returns changes applied"""
+        applied = 0
+        while True:
+            resume = self.resume
+            payload = self._fetch(self.cursor, resume)
+            self._apply(payload, resumed=bool(resume))
+            applied += len(payload["changes"])
+            if not payload["more"]:
+                return applied
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Follow a tear-off primary into a local SQLite replica")
+    p.add_argument("--url", required=True, help="primary base URL, e.g. http://host:5000")
+    p.add_argument("--db", default="replica.db")
+    p.add_argument("--interval", type=float, default=0, help="seconds between syncs (0 = sync once)")
+    args = p.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    replica = Replica(
+        args.url, args.db,
+        user=os.getenv("TICKETS_USER", "admin"),
+        password=os.getenv("TICKETS_PASS", "admin"),
+        token=os.getenv("TICKETS_TOKEN"),
+    )
+    while True:
+        try:
+            n = replica.sync()
+            if n:
+                logger.info(f"Applied {n} changes (cursor {replica.cursor})")
+        except Exception as e:
+            logger.error(f"Sync failed: {e}")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
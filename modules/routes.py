@@ -4,14 +4,24 @@ Handles all Flask route definitions organized by feature
 """
 import os
 import logging
-from datetime import date
-from flask import Blueprint, redirect, url_for, flash, request
-from modules.db import generate_ticket_id
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+from flask import Blueprint, Response, redirect, url_for, flash, request, jsonify, session
 from modules.auth import require_auth
+from modules.credentials import TOKEN_DAYS, USER, issue_token, verify_password
 from modules.theme import render_with_theme
-from modules.db import get_db, now_iso, normalize_tags, generate_ticket_id
-from modules.dates import start_of_week, end_of_week, start_of_month, end_of_month
-from modules.print import print_line, print_cut, print_ticket, print_flush
+from modules.db import get_db, normalize_tags, insert_ticket, close_ticket
+from modules.clock import bounds
+from modules.print import WEEK_LAYOUT, WEEK_LAYOUTS, print_lines, print_ticket, print_week
+from modules.archive import closed_tickets
+from modules.changes import CHANGES_BATCH, changes_since, wake_live_feed
+from modules import metrics, fragments
+from modules.live import publish, stream
+from modules.recurrence import (
+    RULES, expand, dated_tasks, get_occurrence, materialize, materialized,
+    parse_occurrence_id, valid_time
+)
+from modules.stats import HEATMAP_KINDS, open_counts, heatmap, throughput
 
 # Get default tags from .env
 DEFAULT_TAGS = os.getenv("TICKETS_DEFAULT_TAGS", "work,personal")
@@ -21,6 +31,102 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 bp = Blueprint("routes", __name__)
 
+
+def _by_priority(t):
+    """Sort key matching ORDER BY priority DESC, due_at"""
+    return (-t["priority"], t["due_at"] or "")
+
+
+def _respond(message, category, fallback):
+    """Flash and redirect, or answer with JSON for fetch() callers
+
+    Pages with live updates submit forms via fetch and patch the list
+    from the SSE stream, so they skip the redirect and full re-render.
+    """
+    if request.headers.get("X-Requested-With") == "fetch":
+        return jsonify({"message": message, "category": category}), (200 if category == "ok" else 400)
+    flash(message, category)
+    return redirect(fallback)
+
+
+def _all_tags(db):
+    """Return the distinct tags used by open tickets"""
+    tags = set()
+    for row in db.execute("SELECT tags FROM tickets WHERE status='open' AND tags IS NOT NULL"):
+        tags.update(t for t in row["tags"].split(",") if t)
+    return sorted(tags)
+
+
+# ==================================================
+# AUTH
+# ==================================================
+
+def _local_path(url):
+    """True for a path on this site
+
+    Browsers read "/\\host" as "//host" and drop tabs and newlines, so
+    backslashes and control characters are refused as well.
+    """
+    parts = urlsplit(url)
+    return (
+        url.startswith("/") and "\\" not in url and url.isprintable()
+        and not parts.scheme and not parts.netloc
+    )
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+    """Check the password once and hand out a signed session cookie"""
+    next_url = request.values.get("next", "")
+    if not _local_path(next_url):
+        next_url = url_for("routes.today")
+
+    if request.method == "POST":
+        if verify_password(request.form.get("user", ""), request.form.get("password", "")):
+            session.clear()
+            session["user"] = USER
+            session.permanent = True
+            return redirect(next_url)
+        metrics.inc("login_failures")
+        flash("Wrong username or password", "error")
+
+    return render_with_theme("login.html", next=next_url)
+
+
+@bp.route("/logout", methods=["POST"])
+def logout():
+    session.clear()
+    return redirect(url_for("routes.login"))
+
+
+@bp.route("/api/token", methods=["POST"])
+def api_token():
+    """Exchange username/password for a long-lived scoped token
+
+    Credentials come as Basic auth or user/password fields; scopes is a
+    comma-separated subset of read,write,sync (default read).
+    """
+    data = request.get_json(silent=True) or request.form
+    auth = request.authorization
+    user = auth.username if auth and auth.type == "basic" else data.get("user", "")
+    password = auth.password if auth and auth.type == "basic" else data.get("password", "")
+    if not verify_password(user or "", password or ""):
+        metrics.inc("login_failures")
+        return jsonify({"error": "invalid credentials"}), 401
+
+    scopes = [s.strip() for s in str(data.get("scopes", "read")).split(",") if s.strip()]
+    try:
+        days = int(data.get("days", TOKEN_DAYS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "days must be a whole number"}), 400
+    try:
+        token = issue_token(scopes, days)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"token": token, "scopes": sorted(set(scopes)), "days": days})
+
+
 # ==================================================
 # HOME & NAVIGATION
 # ==================================================
@@ -39,55 +145,50 @@ def home():
 @require_auth
 def today():
     db = get_db()
+    b = bounds()
 
     outstanding = db.execute(
         """
         SELECT * FROM tickets
         WHERE status='open'
-          AND (due_at IS NULL OR date(due_at) <= date('now'))
+          AND (due_at IS NULL OR due_at < :tomorrow)
+          AND COALESCE(recurrence, 'none') = 'none'
         ORDER BY priority DESC, due_at
-        """
+        """,
+        b.iso
     ).fetchall()
 
-    return render_with_theme("today.html", outstanding=outstanding)
+    day = b.iso["today"]
+    outstanding = sorted([*outstanding, *expand(db, day, day)], key=_by_priority)
+
+    return render_with_theme("today.html", outstanding=outstanding, today=day)
 
 
 @bp.route("/weekly")
 @require_auth
 def week_view():
     db = get_db()
+    b = bounds()
 
-    today = date.today()
-    week_start = start_of_week(today)
-    week_end = end_of_week(today)
-
-    week_tasks = db.execute(
-        """
-        SELECT * FROM tickets
-        WHERE status = 'open'
-          AND due_at IS NOT NULL
-          AND date(due_at) BETWEEN date(?) AND date(?)
-        ORDER BY due_at, priority DESC
-        """,
-        (week_start.isoformat(), week_end.isoformat())
-    ).fetchall()
+    week_tasks = dated_tasks(db, b.iso["week_start"], b.iso["week_end"])
 
     no_date_tasks = db.execute(
         """
         SELECT * FROM tickets
         WHERE status = 'open'
           AND due_at IS NULL
+          AND COALESCE(recurrence, 'none') = 'none'
         ORDER BY priority DESC, created_at
         """
     ).fetchall()
 
     return render_with_theme(
         "weekly.html",
-        week_start=week_start,
-        week_end=week_end,
+        week_start=b.week_start,
+        week_end=b.week_end,
         week_tasks=week_tasks,
         no_date_tasks=no_date_tasks,
-        today=today
+        today=b.today
     )
 
 
@@ -95,21 +196,10 @@ def week_view():
 @require_auth
 def month_view():
     db = get_db()
+    b = bounds()
+    month_start, month_end = b.month_start, b.month_end
 
-    today = date.today()
-    month_start = start_of_month(today)
-    month_end = end_of_month(today)
-
-    rows = db.execute(
-        """
-        SELECT * FROM tickets
-        WHERE status = 'open'
-          AND due_at IS NOT NULL
-          AND date(due_at) BETWEEN date(?) AND date(?)
-        ORDER BY due_at, priority DESC
-        """,
-        (month_start.isoformat(), month_end.isoformat())
-    ).fetchall()
+    rows = dated_tasks(db, b.iso["month_start"], b.iso["month_end"])
 
     # Prepare calendar context for template
     month = month_start.strftime('%B')
@@ -118,15 +208,16 @@ def month_view():
     last_day = month_end
     tasks_by_day = {}
     for t in rows:
-        try:
-            d = date.fromisoformat(t["due_at"][:10])
-            key = d.strftime('%Y-%m-%d')
-            tasks_by_day.setdefault(key, []).append(t)
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Invalid due_at date format: {t['due_at']}: {e}")
-            continue
+        tasks_by_day.setdefault(t["due_at"][:10], []).append(t)
 
-    today_str = date.today().strftime('%Y-%m-%d')
+    # Concrete tickets come from the stats table; virtual occurrences on top
+    day_counts = heatmap(db, b.iso["month_start"], b.iso["month_end"])
+    for t in rows:
+        if parse_occurrence_id(t["id"]):
+            key = t["due_at"][:10]
+            day_counts[key] = day_counts.get(key, 0) + 1
+
+    today_str = b.iso["today"]
 
     return render_with_theme(
         "monthly.html",
@@ -135,6 +226,7 @@ def month_view():
         first_day=first_day,
         last_day=last_day,
         tasks_by_day=tasks_by_day,
+        day_counts=day_counts,
         today=today_str
     )
 
@@ -160,15 +252,115 @@ def all_tickets():
 def history():
     db = get_db()
 
-    tickets = db.execute(
-        """
-        SELECT * FROM tickets
-        WHERE status='closed'
-        ORDER BY closed_at DESC
-        """
-    ).fetchall()
+    q = request.args.get("q", "").strip()
+    tickets = closed_tickets(db, q or None)
+
+    return render_with_theme("history.html", tickets=tickets, q=q)
+
+
+@bp.route("/stats")
+@require_auth
+def stats_view():
+    db = get_db()
+
+    today = bounds().today
+    year_start = today - timedelta(days=364)
+    year_start -= timedelta(days=year_start.weekday())
+    closed_by_day = heatmap(db, year_start.isoformat(), today.isoformat(), "closed")
+    peak = max(closed_by_day.values(), default=0)
+
+    # One cell per day, Monday-first columns; level 0-4 scaled to the busiest day
+    cells = []
+    for n in range((today - year_start).days + 1):
+        key = (year_start + timedelta(days=n)).isoformat()
+        count = closed_by_day.get(key, 0)
+        cells.append((key, count, -(-4 * count // peak) if peak else 0))
+
+    return render_with_theme(
+        "stats.html",
+        cells=cells,
+        by_tag=open_counts(db, "tag"),
+        by_priority=open_counts(db, "priority"),
+        week=throughput(db, 7, today),
+        month=throughput(db, 30, today),
+        today=today
+    )
+
+
+@bp.route("/api/stats/heatmap")
+@require_auth
+def api_heatmap():
+    """Per-day counts for a date range: ?start=&end=&kind=open|created|closed"""
+    try:
+        start = date.fromisoformat(request.args.get("start", "")[:10])
+        end = date.fromisoformat(request.args.get("end", "")[:10])
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates"}), 400
+
+    kind = request.args.get("kind", "open")
+    if kind not in HEATMAP_KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(HEATMAP_KINDS)}"}), 400
+
+    return jsonify(heatmap(get_db(), start.isoformat(), end.isoformat(), kind))
+
+
+@bp.route("/calendar")
+@require_auth
+def calendar():
+    db = get_db()
+    return render_with_theme(
+        "calendar.html",
+        tag=request.args.get("tag", "all"),
+        all_tags=_all_tags(db),
+        initial_view=request.args.get("view", "dayGridMonth")
+    )
+
+
+@bp.route("/api/events")
+@require_auth
+def api_events():
+    """Calendar feed: open dated tickets plus recurring occurrences"""
+    db = get_db()
+
+    try:
+        start = date.fromisoformat(request.args.get("start", "")[:10])
+        end = date.fromisoformat(request.args.get("end", "")[:10]) - timedelta(days=1)
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates"}), 400
+
+    tag = request.args.get("tag", "all")
+    tag = None if tag == "all" else tag
+
+    events = []
+    for t in dated_tasks(db, start.isoformat(), end.isoformat(), tag):
+        events.append({
+            "id": t["id"],
+            "title": t["title"],
+            "start": t["due_at"],
+            "allDay": len(t["due_at"]) == 10,
+            "extendedProps": {
+                "priority": t["priority"],
+                "tags": t["tags"],
+                "kind": "recurring" if t["recurrence_id"] else "ticket",
+            },
+        })
+    return jsonify(events)
+
+
+@bp.route("/api/changes")
+@require_auth(scope="sync")
+def api_changes():
+    """Incremental sync feed: deltas after ?since=<cursor>, in batches"""
+    try:
+        since = int(request.args.get("since", 0))
+        limit = int(request.args.get("limit", CHANGES_BATCH))
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
 
-    return render_with_theme("history.html", tickets=tickets)
+    try:
+        return jsonify(changes_since(get_db(), since, limit, request.args.get("resume")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 
 # ==================================================
@@ -183,43 +375,51 @@ def add_ticket():
         # Validate required fields
         title = request.form.get("title", "").strip()
         if not title:
-            flash("Title is required", "error")
-            return redirect(request.referrer or url_for("routes.today"))
+            return _respond("Title is required", "error", request.referrer or url_for("routes.today"))
 
         # Validate priority is an integer
         try:
             priority = int(request.form.get("priority", 2))
             if priority < 1 or priority > 5:
-                flash("Priority must be between 1 and 5", "error")
-                return redirect(request.referrer or url_for("routes.today"))
+                return _respond("Priority must be between 1 and 5", "error", request.referrer or url_for("routes.today"))
         except (ValueError, TypeError):
-            flash("Invalid priority value", "error")
-            return redirect(request.referrer or url_for("routes.today"))
+            return _respond("Invalid priority value", "error", request.referrer or url_for("routes.today"))
 
         # Optional fields
+        notes = request.form.get("notes", "").strip() or None
         due_date = request.form.get("due_date", "").strip() or None
+        recurrence = request.form.get("recurrence", "none")
+        if recurrence != "none" and recurrence not in RULES:
+            return _respond("Invalid recurrence", "error", request.referrer or url_for("routes.today"))
+        recurrence_time = request.form.get("recurrence_time", "").strip() or None
+        recurrence_start = request.form.get("recurrence_start", "").strip() or None
+        if recurrence_time and not valid_time(recurrence_time):
+            return _respond("Recurrence time must be HH:MM", "error", request.referrer or url_for("routes.today"))
+        if recurrence_start:
+            try:
+                date.fromisoformat(recurrence_start)
+            except ValueError:
+                return _respond("Invalid recurrence start date", "error", request.referrer or url_for("routes.today"))
+        if recurrence != "none":
+            # Rules carry no due date; occurrences are expanded at query time
+            due_date = None
         tags_input = request.form.get("tags", "").strip()
         # Use provided tags or default to TICKETS_DEFAULT_TAGS
         tags = normalize_tags(tags_input) if tags_input else normalize_tags(DEFAULT_TAGS)
 
         # Insert ticket
         db = get_db()
-        db.execute(
-            """
-            INSERT INTO tickets
-            (id, title, priority, due_at, tags, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (generate_ticket_id(), title, priority, due_date, tags, now_iso())
+        insert_ticket(
+            db, title, priority, due_date, tags, notes,
+            recurrence, recurrence_time, recurrence_start
         )
         db.commit()
-        flash(f"Ticket '{title}' created", "ok")
-        return redirect(url_for("routes.today"))
+        wake_live_feed()
+        return _respond(f"Ticket '{title}' created", "ok", url_for("routes.today"))
 
     except Exception as e:
         logger.error(f"Error adding ticket: {e}")
-        flash("Failed to create ticket", "error")
-        return redirect(request.referrer or url_for("routes.today"))
+        return _respond("Failed to create ticket", "error", request.referrer or url_for("routes.today"))
 
 
 # ==================================================
@@ -229,9 +429,7 @@ def add_ticket():
 @bp.route("/print/test")
 @require_auth
 def print_test():
-    print_line("HELLO FROM FLASK")
-    print_cut()
-    print_flush()
+    print_lines(["HELLO FROM FLASK"], request.args.get("printer"))
     return "OK"
 
 
@@ -242,18 +440,15 @@ def print_single(ticket_id):
     t = db.execute(
         "SELECT * FROM tickets WHERE id=?",
         (ticket_id,)
-    ).fetchone()
+    ).fetchone() or get_occurrence(db, ticket_id)
 
     if not t:
-        flash("Ticket not found", "error")
-        return redirect(url_for("routes.today"))
+        return _respond("Ticket not found", "error", url_for("routes.today"))
 
-    print_ticket(t)
-    print_cut()
-    print_flush()
+    print_ticket(t, request.form.get("printer") or None)
+    publish("printed", id=t["id"], title=t["title"])
 
-    flash("Ticket printed", "ok")
-    return redirect(url_for("routes.today"))
+    return _respond(f"'{t['title']}' printed", "ok", url_for("routes.today"))
 
 
 @bp.route("/print/weekly", methods=["POST"])
@@ -261,43 +456,19 @@ def print_single(ticket_id):
 def print_weekly():
     """Print all tasks for the current week"""
     db = get_db()
+    b = bounds()
 
-    today = date.today()
-    week_start = start_of_week(today)
-    week_end = end_of_week(today)
-
-    week_tasks = db.execute(
-        """
-        SELECT * FROM tickets
-        WHERE status = 'open'
-          AND due_at IS NOT NULL
-          AND date(due_at) BETWEEN date(?) AND date(?)
-        ORDER BY due_at, priority DESC
-        """,
-        (week_start.isoformat(), week_end.isoformat())
-    ).fetchall()
-
-    # Print header
-    print_line("=" * 46)
-    print_line(f"WEEK {week_start.strftime('%b %d')} - {week_end.strftime('%b %d')}".center(46))
-    print_line("=" * 46)
-    print_line("")
+    layout = request.form.get("layout", WEEK_LAYOUT)
+    if layout not in WEEK_LAYOUTS:
+        return _respond(f"Unknown layout '{layout}'", "error", url_for("routes.week_view"))
 
-    # Print each ticket
-    if week_tasks:
-        for t in week_tasks:
-            print_ticket(t)
-    else:
-        print_line("No tasks this week".center(46))
-        print_line("")
-
-    # Print footer
-    print_line("=" * 46)
-    print_cut()
-    print_flush()
+    week_tasks = dated_tasks(db, b.iso["week_start"], b.iso["week_end"])
+    lines = print_week(
+        b.week_start, b.week_end, week_tasks, request.form.get("printer") or None, layout=layout
+    )
+    publish("printed", ids=[t["id"] for t in week_tasks], title="Week")
 
-    flash("Week printed", "ok")
-    return redirect(url_for("routes.week_view"))
+    return _respond(f"Week printed ({lines} lines)", "ok", url_for("routes.week_view"))
 
 
 @bp.route("/print/free", methods=["POST"])
@@ -312,8 +483,8 @@ def print_free():
     
     try:
         sep = "=" * 42
-        print_line(sep)
-        
+        lines = [sep]
+
         # Word wrap the text to fit the printer width
         words = text.split()
         line = ""
@@ -321,15 +492,14 @@ def print_free():
             if len(line) + len(w) + 1 <= 42:
                 line = f"{line} {w}".strip()
             else:
-                print_line(line.center(42))
+                lines.append(line.center(42))
                 line = w
         if line:
-            print_line(line.center(42))
-        
-        print_line(sep)
-        print_cut()
-        print_flush()
-        
+            lines.append(line.center(42))
+
+        lines.append(sep)
+        print_lines(lines, request.form.get("printer") or None)
+
         flash("Text printed", "ok")
     except Exception as e:
         logger.error(f"Error printing free text: {e}")
@@ -342,31 +512,108 @@ def print_free():
 # TICKET STATUS MANAGEMENT
 # ==================================================
 
+def _close(db, ticket_id):
+    """Close a ticket or occurrence; returns (row, closed now) or (None, False)"""
+    # Recurring occurrences only become real rows once they are closed
+    ticket_id = materialize(db, ticket_id) or ticket_id
+
+    t = db.execute(
+        "SELECT id, title FROM tickets WHERE id=?",
+        (ticket_id,)
+    ).fetchone() or db.execute(
+        # An archived row was closed long ago
+        "SELECT id, title FROM tickets_archive WHERE id=?",
+        (ticket_id,)
+    ).fetchone()
+    if not t:
+        return None, False
+
+    closed = close_ticket(db, ticket_id)
+    db.commit()
+    if closed:
+        wake_live_feed()
+    return t, closed
+
+
 @bp.route("/done/<ticket_id>", methods=["POST"])
 @require_auth
 def mark_done(ticket_id):
     """Mark a ticket as done"""
+    t, _ = _close(get_db(), ticket_id)
+    if not t:
+        return _respond("Ticket not found", "error", request.referrer or url_for("routes.today"))
+
+    return _respond(f"'{t['title']}' marked done", "ok", request.referrer or url_for("routes.today"))
+
+
+@bp.route("/scan")
+@require_auth
+def scan_page():
+    """Scan station: a USB scanner types codes into the box, each closes a ticket"""
+    return render_with_theme("scan.html")
+
+
+@bp.route("/scan/<path:code>")
+@require_auth
+def scan_confirm(code):
+    """What a phone camera opens: the ticket and a button that POSTs the close
+
+    GET never closes anything, so link previews, prefetching and links on
+    other sites (the session cookie is SameSite=Lax) can't mark tickets done.
+    """
     db = get_db()
-    
-    # Verify ticket exists
+    ticket_id = code.rsplit("/", 1)[-1].strip()
     t = db.execute(
-        "SELECT id, title FROM tickets WHERE id=?",
+        "SELECT * FROM tickets WHERE id=?",
         (ticket_id,)
-    ).fetchone()
+    ).fetchone() or materialized(db, ticket_id) or get_occurrence(db, ticket_id)
+    return render_with_theme("scan_confirm.html", t=t, code=ticket_id)
 
+
+@bp.route("/scan/<path:code>", methods=["POST"])
+@require_auth
+def scan(code):
+    """Close the ticket a printed QR code points at"""
+    t, closed = _close(get_db(), code.rsplit("/", 1)[-1].strip())
+    metrics.inc("scans", result="closed" if closed else "already_closed" if t else "unknown")
     if not t:
-        flash("Ticket not found", "error")
-        return redirect(request.referrer or url_for("routes.today"))
+        message, category = "Unknown ticket code", "error"
+    elif closed:
+        message, category = f"'{t['title']}' marked done", "ok"
+    else:
+        message, category = f"'{t['title']}' was already done", "ok"
+    return _respond(message, category, url_for("routes.scan_page"))
+
 
-    # Update ticket status to closed
-    db.execute(
-        "UPDATE tickets SET status='closed', closed_at=? WHERE id=?",
-        (now_iso(), ticket_id)
+# ==================================================
+# LIVE UPDATES
+# ==================================================
+
+@bp.route("/events/stream")
+@require_auth
+def event_stream():
+    """Server-Sent Events feed of ticket deltas for open pages"""
+    try:
+        last_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_id = None
+
+    return Response(
+        stream(last_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    db.commit()
-    
-    flash(f"'{t['title']}' marked done", "ok")
-    return redirect(request.referrer or url_for("routes.today"))
+
+
+# ==================================================
+# METRICS
+# ==================================================
+
+@bp.route("/metrics")
+@require_auth
+def metrics_view():
+    fragments.report()
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 # ==================================================
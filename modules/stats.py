@@ -0,0 +1,57 @@
+"""
+Stats module for ticket system
+Reads the trigger-maintained stats_open / stats_daily tables, so dashboards
+and heatmaps cost O(days) rows however much history has piled up
+"""
+from datetime import timedelta
+from modules.clock import bounds
+
+HEATMAP_KINDS = ("open", "created", "closed")
+
+
+def open_counts(db, dim):
+    """Open ticket counts for one dimension (day, tag or priority), largest first"""
+    rows = db.execute(
+        "SELECT key, count FROM stats_open WHERE dim=? ORDER BY count DESC, key",
+        (dim,)
+    ).fetchall()
+    return {r["key"]: r["count"] for r in rows}
+
+
+def heatmap(db, start, end, kind="open"):
+    """Per-day counts between two ISO dates (inclusive), missing days omitted
+
+    kind=open counts open tickets by due date; created and closed count
+    tickets by the day they were opened or closed.
+    """
+    if kind == "open":
+        rows = db.execute(
+            "SELECT key AS day, count FROM stats_open "
+            "WHERE dim='day' AND key BETWEEN ? AND ? ORDER BY key",
+            (start, end)
+        ).fetchall()
+    else:
+        rows = db.execute(
+            f"SELECT day, {kind} AS count FROM stats_daily "
+            f"WHERE day BETWEEN ? AND ? AND {kind} > 0 ORDER BY day",
+            (start, end)
+        ).fetchall()
+    return {r["day"]: r["count"] for r in rows}
+
+
+def throughput(db, days=30, today=None):
+    """Created vs closed over the last `days` days, with per-day averages"""
+    today = today or bounds().today
+    start = (today - timedelta(days=days - 1)).isoformat()
+    row = db.execute(
+        "SELECT COALESCE(SUM(created), 0) AS created, COALESCE(SUM(closed), 0) AS closed "
+        "FROM stats_daily WHERE day BETWEEN ? AND ?",
+        (start, today.isoformat())
+    ).fetchone()
+    return {
+        "days": days,
+        "created": row["created"],
+        "closed": row["closed"],
+        "net": row["created"] - row["closed"],
+        "closed_per_day": round(row["closed"] / days, 1),
+    }
@@ -1,8 +1,8 @@
 import os
-import sqlite3
-from datetime import datetime, timedelta, date
+from datetime import timedelta, date
 from dotenv import load_dotenv
 import random
+from modules.db import connect, insert_ticket
 
 load_dotenv()
 
@@ -12,28 +12,12 @@ DB_PATH = DB_NAME if os.path.isabs(DB_NAME) else os.path.join(APP_DIR, DB_NAME)
 
 print(f"[INFO] Seeding database: {DB_PATH}")
 
-conn = sqlite3.connect(DB_PATH)
-conn.row_factory = sqlite3.Row
-cur = conn.cursor()
+conn = connect(DB_PATH)
 
-now = datetime.now()
 
 def add(title, days_offset, priority=2, tags=None):
     due = (date.today() + timedelta(days=days_offset)).isoformat()
-    cur.execute(
-        """
-        INSERT INTO tickets
-        (title, priority, due_at, tags, status, created_at)
-        VALUES (?, ?, ?, ?, 'open', ?)
-        """,
-        (
-            title,
-            priority,
-            due,
-            tags,
-            now.isoformat(timespec="seconds")
-        )
-    )
+    insert_ticket(conn, title, priority, due, tags, None)
 
 # -----------------------------
 # Overdue tasks
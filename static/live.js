@@ -0,0 +1,160 @@
+// Live updates: patch ticket lists in place from the /events/stream SSE feed
+// instead of reloading the whole page after every action.
+(function () {
+  if (!window.EventSource) return;
+
+  const lists = document.querySelectorAll("[data-live-list]");
+
+  function flash(msg, category) {
+    const el = document.createElement("div");
+    el.className = "flash " + (category || "ok");
+    el.textContent = msg;
+    const topbar = document.querySelector(".topbar");
+    topbar.insertAdjacentElement("afterend", el);
+    setTimeout(function () { el.remove(); }, 4000);
+  }
+
+  function wanted(list, t) {
+    if (!t.due_at) return list.hasAttribute("data-live-undated");
+    const day = t.due_at.slice(0, 10);
+    const from = list.getAttribute("data-live-from");
+    const until = list.getAttribute("data-live-until");
+    if (!until) return false;
+    return day <= until && (!from || day >= from);
+  }
+
+  function span(cls, text) {
+    const el = document.createElement("span");
+    el.className = cls;
+    el.textContent = text;
+    return el;
+  }
+
+  function card(t) {
+    const wrap = document.createElement("div");
+    wrap.setAttribute("data-ticket-id", t.id);
+
+    const c = document.createElement("div");
+    c.className = "card task-card";
+
+    const main = document.createElement("div");
+    main.className = "task-main";
+    const title = document.createElement("div");
+    title.className = "task-title";
+    title.textContent = t.title;
+    main.appendChild(title);
+    if (t.notes) {
+      const notes = document.createElement("div");
+      notes.className = "task-notes";
+      notes.textContent = t.notes;
+      main.appendChild(notes);
+    }
+
+    const meta = document.createElement("div");
+    meta.className = "task-meta";
+    meta.appendChild(span("priority", "P" + t.priority));
+    meta.appendChild(t.due_at ? span("due", "Due " + t.due_at.slice(0, 16)) : span("no-due", "No due date"));
+    if (t.tags) meta.appendChild(span("tags", t.tags));
+
+    const form = document.createElement("form");
+    form.method = "POST";
+    form.action = "/done/" + encodeURIComponent(t.id);
+    form.setAttribute("data-live", "");
+    const btn = document.createElement("button");
+    btn.className = "btn btn-success";
+    btn.type = "submit";
+    btn.textContent = "✓ Mark done";
+    form.appendChild(btn);
+
+    c.appendChild(main);
+    c.appendChild(meta);
+    c.appendChild(form);
+    wrap.appendChild(c);
+    return wrap;
+  }
+
+  function removeTicket(id) {
+    if (!id) return;
+    document.querySelectorAll("[data-ticket-id]").forEach(function (el) {
+      if (el.getAttribute("data-ticket-id") === String(id)) el.remove();
+    });
+  }
+
+  // Prints submitted from this page report their own result (e.g. "Week
+  // printed (N lines)"), so the matching "printed" event isn't flashed twice
+  let ownPrints = 0;
+
+  // Submit marked forms with fetch; the stream does the DOM patching
+  document.addEventListener("submit", function (e) {
+    const form = e.target;
+    if (!form.hasAttribute("data-live")) return;
+    e.preventDefault();
+    const isPrint = new URL(form.action, window.location.href).pathname.startsWith("/print/");
+    if (isPrint) ownPrints++;
+    fetch(form.action, {
+      method: "POST",
+      body: new FormData(form),
+      credentials: "include",
+      headers: { "X-Requested-With": "fetch" }
+    })
+      .then(function (r) { return r.json(); })
+      .then(function (data) {
+        // Other successes show up through the stream on every screen
+        if (data.category !== "ok" && isPrint) ownPrints = Math.max(0, ownPrints - 1);
+        if (data.category !== "ok" || isPrint) flash(data.message, data.category);
+      })
+      .catch(function () { form.submit(); });
+  });
+
+  const source = new EventSource("/events/stream");
+
+  // An open ticket was added or edited, here or anywhere else (CLI, other screens)
+  source.addEventListener("ticket", function (e) {
+    const t = JSON.parse(e.data);
+    if (t.recurrence && t.recurrence !== "none") return;
+    removeTicket(t.id);
+    lists.forEach(function (list) {
+      if (!wanted(list, t)) return;
+      const empty = list.querySelector(".empty");
+      if (empty) empty.remove();
+      list.appendChild(card(t));
+    });
+  });
+
+  source.addEventListener("closed", function (e) {
+    const d = JSON.parse(e.data);
+    removeTicket(d.id);
+    removeTicket(d.ticket_id);
+  });
+
+  source.addEventListener("printed", function (e) {
+    const d = JSON.parse(e.data);
+    if (ownPrints > 0) {
+      ownPrints--;
+      return;
+    }
+    flash("Printed: " + d.title, "ok");
+  });
+
+  source.addEventListener("printer", function (e) {
+    const d = JSON.parse(e.data);
+    document.querySelectorAll("[data-printer]").forEach(function (el) {
+      if (el.getAttribute("data-printer") !== d.name) return;
+      el.className = "printer-state state-" + d.state;
+      el.title = d.queued + " queued";
+      el.textContent = "🖨 " + d.name + ": " + d.state.replace("_", " ");
+    });
+    if (d.state !== "ok" && d.state !== "unknown") {
+      flash("Printer " + d.name + ": " + d.state.replace("_", " ") + " — jobs are held", "error");
+    }
+  });
+
+  source.addEventListener("reload", function () {
+    window.location.reload();
+  });
+
+  // Midnight in the server's timezone: "today" and "this week" have moved
+  source.addEventListener("day", function () {
+    window.location.reload();
+  });
+})();
@@ -0,0 +1,94 @@
+"""
+Exercise the notification sinks against local stub HTTP servers.
+A Telegram stub that rate-limits once, a slow webhook and an SMS gateway that
+always fails (so its batch is dead-lettered), plus a webhook with a bad URL
+(dead-lettered on the first attempt):
+python tests/notify-sinks.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+received = {"telegram": [], "webhook": [], "sms": 0}
+limited = threading.Event()
+
+
+class Stub(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if "/sendMessage" in self.path:
+            if not limited.is_set():
+                limited.set()
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.end_headers()
+                return
+            received["telegram"].append(body["text"])
+        elif self.path == "/hook":
+            time.sleep(2)
+            received["webhook"].append(body["messages"])
+        else:
+            received["sms"] += 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_port}"
+
+os.environ.update(
+    TICKETS_DB=os.path.join(tempfile.mkdtemp(), "notify.db"),
+    TICKETS_PRINTERS=f"phone=telegram:42;hook=webhook:{base}/hook;sms=sms:+15550100;bad=webhook:not-a-url",
+    TICKETS_TELEGRAM_TOKEN="test",
+    TICKETS_TELEGRAM_API=base,
+    TICKETS_SMS_URL=f"{base}/sms",
+    TICKETS_NOTIFY_BATCH_SECS="0.2",
+    TICKETS_NOTIFY_RETRIES="2",
+    TICKETS_NOTIFY_RATE="10",
+)
+from modules.db import connect  # noqa: E402
+from modules.notify import dead_letters  # noqa: E402
+from modules.print import print_ticket, drain  # noqa: E402
+
+tickets = [
+    {"id": f"t{i}", "priority": 2, "tags": "work", "title": f"Sink test {i}", "due_at": "2026-02-06"}
+    for i in range(5)
+]
+
+started = time.monotonic()
+for name in ("phone", "hook", "sms"):
+    for t in tickets:
+        print_ticket(t, name)
+print(f"queued 15 jobs in {(time.monotonic() - started) * 1000:.1f}ms")
+assert time.monotonic() - started < 0.5, "submitting must not wait for the network"
+print_ticket(tickets[0], "bad")
+
+drain()
+print(f"delivered in {time.monotonic() - started:.1f}s")
+print(f"telegram: {len(received['telegram'])} message(s) after one 429")
+print(received["telegram"][0])
+print(f"webhook: {len(received['webhook'])} batch(es) of {[len(b) for b in received['webhook']]}")
+print(f"sms: {received['sms']} attempts")
+
+assert sum(t.count("SINK TEST") for t in received["telegram"]) == 5
+assert sum(len(b) for b in received["webhook"]) == 5
+rows = dead_letters(connect())
+assert sorted(r["sink"] for r in rows) == ["bad", "sms"], rows
+assert [r["attempts"] for r in rows if r["sink"] == "bad"] == [1], rows
+for r in rows:
+    print(f"dead letter: {r['sink']} {r['error']} after {r['attempts']} attempts")
+print("OK")
@@ -0,0 +1,46 @@
+"""
+Measure print job throughput against the bundled ESC/POS emulator.
+Runs on Linux without a printer: python tests/print-throughput.py --jobs 50 --line-speed 60
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.emulator import EmulatedPrinter
+
+p = argparse.ArgumentParser()
+p.add_argument("--jobs", type=int, default=20)
+p.add_argument("--line-speed", type=float, default=0)
+p.add_argument("--buffer-size", type=int, default=4096)
+p.add_argument("--paper-lines", type=int, default=None)
+args = p.parse_args()
+
+emu = EmulatedPrinter(
+    port=0, line_speed=args.line_speed, buffer_size=args.buffer_size, paper_lines=args.paper_lines
+).start()
+
+# Point the print module at the emulator before it reads its config
+os.environ["NO_PRINTER"] = "false"
+os.environ["TICKETS_PRINTERS"] = f"emu=network:127.0.0.1:{emu.port}"
+from modules.print import print_ticket, drain  # noqa: E402
+
+ticket = {"priority": 1, "tags": "work", "title": "Throughput test ticket", "due_at": "2026-02-06"}
+
+started = time.monotonic()
+for _ in range(args.jobs):
+    print_ticket(ticket)
+drain()
+emu.wait_for_jobs(args.jobs)
+elapsed = time.monotonic() - started
+
+lines = sum(len(j.lines) for j in emu.jobs)
+dropped = sum(j.dropped_lines for j in emu.jobs)
+print(f"{len(emu.jobs)} jobs, {lines} lines in {elapsed:.2f}s")
+print(f"{len(emu.jobs) / elapsed:.1f} jobs/s, {lines / elapsed:.1f} lines/s")
+if dropped:
+    print(f"{dropped} lines lost to paper out")
+print("\nLast job:\n" + emu.jobs[-1].text())
+emu.stop()
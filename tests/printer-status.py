@@ -0,0 +1,92 @@
+"""
+Exercise printer status monitoring against the bundled ESC/POS emulator.
+Runs the paper-out / cover-open / recovery cycle and checks jobs are held, not lost,
+that a job that fails while the printer is fine is dead-lettered after one try,
+and that a drain with a timeout gives up on an offline printer:
+python tests/printer-status.py
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.emulator import EmulatedPrinter
+
+emu = EmulatedPrinter(port=0).start()
+
+os.environ["NO_PRINTER"] = "false"
+os.environ["TICKETS_PRINTERS"] = f"emu=network:127.0.0.1:{emu.port}"
+os.environ["TICKETS_PRINTER_POLL"] = "0.2"
+os.environ["TICKETS_DB"] = os.path.join(tempfile.mkdtemp(), "tickets.db")
+from modules.db import connect  # noqa: E402
+from modules.print import Job, get_worker, print_lines, submit, drain, dead_letters  # noqa: E402
+
+worker = get_worker("emu")
+
+
+def wait_state(state, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and worker.state != state:
+        time.sleep(0.05)
+    print(f"state: {worker.state}")
+    assert worker.state == state, f"expected {state}"
+
+
+wait_state("ok")
+print_lines(["first"])
+drain()
+assert emu.wait_for_jobs(1)
+
+for problem in ("paper_out", "cover_open"):
+    if problem == "paper_out":
+        emu.load_paper(0)
+    else:
+        emu.load_paper()
+        emu.cover_open = True
+    wait_state(problem)
+
+    before = len(emu.jobs)
+    print_lines([f"held while {problem}"])
+    time.sleep(0.5)
+    assert len(emu.jobs) == before, "job should be held in the queue"
+    print(f"held jobs: {worker.queue.unfinished_tasks}")
+
+    emu.load_paper()
+    emu.cover_open = False
+    wait_state("ok")
+    drain()
+    assert emu.wait_for_jobs(before + 1), "held job should print once the printer is back"
+    print(f"resumed: {emu.jobs[-1].text()!r}")
+
+# A job that can't be encoded fails with the printer ok: no resends, queue keeps going
+before = len(emu.jobs)
+bad = Job()
+bad.line("partial")
+bad.ops.append(("text", None))
+submit(bad)
+print_lines(["after the bad job"])
+drain()
+assert emu.wait_for_jobs(before + 2)
+time.sleep(0.5)
+assert len(emu.jobs) == before + 2, "bad job should be sent once, not retried"
+assert emu.jobs[-1].text().strip().startswith("after the bad job")
+rows = dead_letters(connect())
+assert len(rows) == 1 and rows[0]["attempts"] == 1, rows
+print(f"dead-lettered: {rows[0]['error']}")
+
+emu.stop()
+wait_state("offline")
+
+# drain() must not hang on an offline printer; shelving dead-letters the held job
+print_lines(["printer gone"])
+started = time.monotonic()
+stuck = drain(0.5)
+assert stuck == [worker] and time.monotonic() - started < 2, stuck
+assert worker.shelve() == 1
+assert drain(1) == [], "the held job should be released"
+rows = dead_letters(connect())
+assert len(rows) == 2 and rows[-1]["error"] == "held while printer offline", rows
+print(f"shelved: {rows[-1]['error']}")
+print("OK")
@@ -0,0 +1,53 @@
+"""
+Check that due dates SQLite can't parse ("Friday", "05/01/2026") neither
+block adding tickets nor stop an older database from opening:
+python tests/stats-baddates.py
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ["TICKETS_DB"] = os.path.join(tempfile.mkdtemp(), "tickets.db")
+from modules.db import DB_PATH, connect, insert_ticket, close_ticket  # noqa: E402
+from modules.stats import open_counts  # noqa: E402
+
+# A database from before the stats tables, already holding a free-text due date
+old = sqlite3.connect(DB_PATH)
+old.executescript("""
+CREATE TABLE tickets (
+  id TEXT PRIMARY KEY,
+  title TEXT NOT NULL,
+  notes TEXT,
+  priority INTEGER NOT NULL DEFAULT 2,
+  due_at TEXT,
+  status TEXT NOT NULL DEFAULT 'open',
+  created_at TEXT NOT NULL,
+  closed_at TEXT,
+  tags TEXT
+);
+INSERT INTO tickets (id, title, due_at, created_at) VALUES ('old', 'Old ticket', 'Friday', '2026-01-01T09:00:00');
+""")
+old.close()
+
+db = connect()
+print(f"opened: {open_counts(db, 'priority')}")
+
+ids = [
+    insert_ticket(db, "Free text", 2, "next week", "work", None),
+    insert_ticket(db, "US date", 3, "05/01/2026", "work", None),
+    insert_ticket(db, "ISO date", 3, "2026-05-01T10:00", "work", None),
+]
+db.commit()
+days = open_counts(db, "day")
+print(f"days: {days}")
+assert days == {"2026-05-01": 1}, days
+assert open_counts(db, "priority") == {"2": 2, "3": 2}
+
+close_ticket(db, ids[0])
+close_ticket(db, "old")
+db.commit()
+assert open_counts(db, "priority") == {"3": 2}
+print("OK")
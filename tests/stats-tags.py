@@ -0,0 +1,44 @@
+"""
+Check the trigger-maintained tag counts against a recount, with tags that
+contain backslashes and quotes (these once broke the stats triggers):
+python tests/stats-tags.py
+"""
+import os
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ["TICKETS_DB"] = os.path.join(tempfile.mkdtemp(), "tickets.db")
+from modules.db import connect, insert_ticket, close_ticket, normalize_tags, rebuild_stats  # noqa: E402
+from modules.stats import open_counts  # noqa: E402
+
+TAGS = ["foo\\xbar", '"quoted"', "it's", "work", 'a\\"b', "[x]", "work,foo\\xbar"]
+
+
+def recount(db):
+    counts = Counter()
+    for row in db.execute("SELECT tags FROM tickets WHERE status='open' AND tags IS NOT NULL"):
+        counts.update(t for t in row["tags"].split(",") if t)
+    return dict(counts)
+
+
+db = connect()
+ids = [insert_ticket(db, f"ticket {i}", 2, None, normalize_tags(tags), None) for i, tags in enumerate(TAGS)]
+db.commit()
+print(f"after insert: {open_counts(db, 'tag')}")
+assert open_counts(db, "tag") == recount(db)
+assert open_counts(db, "tag")["foo\\xbar"] == 2
+assert open_counts(db, "tag")['"quoted"'] == 1
+
+close_ticket(db, ids[0])
+db.execute("UPDATE tickets SET tags=? WHERE id=?", ('new\\tag,"q"', ids[1]))
+db.commit()
+print(f"after close/edit: {open_counts(db, 'tag')}")
+assert open_counts(db, "tag") == recount(db)
+
+with db:
+    rebuild_stats(db)
+assert open_counts(db, "tag") == recount(db)
+print("OK")
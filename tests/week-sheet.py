@@ -0,0 +1,56 @@
+"""
+Compare the full and compact week sheet layouts on the bundled ESC/POS emulator.
+Prints paper lines and print time for each: python tests/week-sheet.py --tasks 30 --line-speed 60
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.emulator import EmulatedPrinter
+
+p = argparse.ArgumentParser()
+p.add_argument("--tasks", type=int, default=30)
+p.add_argument("--line-speed", type=float, default=60)
+args = p.parse_args()
+
+emu = EmulatedPrinter(port=0, line_speed=args.line_speed).start()
+
+os.environ["NO_PRINTER"] = "false"
+os.environ["TICKETS_PRINTERS"] = f"emu=network:127.0.0.1:{emu.port}"
+os.environ["TICKETS_PRINTER_POLL"] = "0"
+from modules.dates import start_of_week, end_of_week  # noqa: E402
+from modules.print import print_week, drain  # noqa: E402
+
+week_start = start_of_week(date.today())
+week_end = end_of_week(date.today())
+tasks = sorted(
+    (
+        {
+            "id": f"t{i}",
+            "priority": i % 3 + 1,
+            "tags": ["work", "home,errand", ""][i % 3],
+            "title": f"Week sheet task number {i}",
+            "due_at": f"{week_start + timedelta(days=i % 7)}T{9 + i % 8:02d}:00",
+        }
+        for i in range(args.tasks)
+    ),
+    key=lambda t: t["due_at"],
+)
+
+for layout in ("full", "compact"):
+    before = len(emu.jobs)
+    started = time.monotonic()
+    queued = print_week(week_start, week_end, tasks, layout=layout)
+    drain()
+    emu.wait_for_jobs(before + 1)
+    elapsed = time.monotonic() - started
+    job = emu.jobs[-1]
+    tall = sum(1 for line in job.lines if line["height"] == 2)
+    print(f"{layout:>8}: {queued} lines queued, {len(job.lines)} printed ({tall} double-height) in {elapsed:.2f}s")
+
+print("\nCompact sheet:\n" + emu.jobs[-1].text())
+emu.stop()